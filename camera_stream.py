@@ -0,0 +1,601 @@
+import io
+import itertools
+import threading
+import time
+from histogram import Histogram
+
+# Multipart framing for the MJPEG stream
+FRAME_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n'
+FRAME_FOOTER = b'\r\n'
+
+class FrameBroadcaster:
+    """Publish each encoded frame once and fan it out to every stream client.
+
+    Every frame is stored as one ready-to-send multipart part, built when
+    it is published. Stream clients all yield that same bytes object, so
+    serving another viewer costs no extra copies; readers that want the
+    JPEG itself get a memoryview into the part.
+    """
+
+    def __init__(self, max_fps=30, ring_size=4):
+        # Default per-client frame rate cap
+        self.max_fps = max_fps
+
+        # Ring of recent frames as (sequence, part, jpeg view, wall-clock publish time);
+        # slot = sequence % ring_size.
+        # Sequence 0 means no frame yet.
+        self.ring = [None] * ring_size
+        self.sequence = 0
+
+        # Number of clients currently attached to the stream
+        self.subscribers = 0
+
+        # Per-client stream statistics, keyed by client id
+        self.clients = {}
+        self.client_ids = itertools.count(1)
+        self.bytes_sent = 0
+        self.frames_sent = 0
+
+        # Condition used to wake subscribers when a new frame arrives
+        self.condition = threading.Condition()
+        self.is_running = True
+
+    def publish(self, frame):
+        """Store a new JPEG frame (any bytes-like object) and wake all waiting clients"""
+        # The only copy of the frame: straight from the encoder's buffer into the part
+        length = memoryview(frame).nbytes
+        header = FRAME_HEADER % length
+        part = b''.join((header, frame, FRAME_FOOTER))
+        jpeg = memoryview(part)[len(header):len(header) + length]
+        with self.condition:
+            self.sequence += 1
+            self.ring[self.sequence % len(self.ring)] = (self.sequence, part, jpeg, time.time())
+            self.condition.notify_all()
+
+    def _latest(self):
+        if self.sequence == 0:
+            return 0, None, None, None
+        return self.ring[self.sequence % len(self.ring)]
+
+    def get_frame(self):
+        """Get the latest sequence number and JPEG (a read-only memoryview)"""
+        with self.condition:
+            sequence, _, jpeg, _ = self._latest()
+            return sequence, jpeg
+
+    def get_frame_time(self, sequence):
+        """Get the wall-clock time frame sequence was published, if it is still in the ring"""
+        with self.condition:
+            slot = self.ring[sequence % len(self.ring)]
+            if slot is not None and slot[0] == sequence:
+                return slot[3]
+            return None
+
+    def get_recent_frame(self, sequence):
+        """Get the JPEG for sequence if it is still in the ring, else None"""
+        with self.condition:
+            slot = self.ring[sequence % len(self.ring)]
+            if slot is not None and slot[0] == sequence:
+                return slot[2]
+            return None
+
+    def wait_for_frame(self, last_sequence, timeout=1.0):
+        """Block until a frame newer than last_sequence is published"""
+        sequence, _, jpeg, _ = self._wait_for_slot(last_sequence, timeout)
+        return sequence, jpeg
+
+    def _wait_for_slot(self, last_sequence, timeout):
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.sequence != last_sequence or not self.is_running,
+                timeout
+            )
+            return self._latest()
+
+    def stream(self, max_fps=None):
+        """Generate multipart JPEG chunks for one client.
+
+        Each frame is sent at most once. A client that is slower than the
+        camera always resumes with the newest frame, so intermediate frames
+        are dropped instead of queued.
+        """
+        if max_fps is None:
+            max_fps = self.max_fps
+        min_interval = 1.0 / max_fps if max_fps and max_fps > 0 else 0
+
+        client = {'frames': 0, 'bytes': 0, 'fps': 0.0, 'last_sent': None}
+        client_id = next(self.client_ids)
+        self.clients[client_id] = client
+        self.subscribe()
+        try:
+            last_sequence = 0
+            next_send = 0
+            while self.is_running:
+                # Pace this client before picking up the newest frame
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+                sequence, chunk, _, _ = self._wait_for_slot(last_sequence, 1.0)
+                if sequence == last_sequence or chunk is None:
+                    continue
+
+                last_sequence = sequence
+                now = time.monotonic()
+                next_send = now + min_interval
+                # Shared, prebuilt part: nothing is copied per client
+                yield chunk
+
+                # Track this client's delivered frame rate
+                if client['last_sent'] is not None:
+                    interval = now - client['last_sent']
+                    if interval > 0:
+                        client['fps'] = 0.8 * client['fps'] + 0.2 / interval
+                client['last_sent'] = now
+                client['frames'] += 1
+                client['bytes'] += len(chunk)
+                self.frames_sent += 1
+                self.bytes_sent += len(chunk)
+        finally:
+            self.clients.pop(client_id, None)
+            self.unsubscribe()
+
+    def subscribe(self):
+        """Register a frame consumer"""
+        with self.condition:
+            self.subscribers += 1
+            self.condition.notify_all()
+
+    def unsubscribe(self):
+        """Unregister a frame consumer"""
+        with self.condition:
+            self.subscribers -= 1
+            self.condition.notify_all()
+
+    def get_client_stats(self):
+        """Get frames, bytes and current fps for each connected stream client"""
+        return {
+            client_id: {
+                'frames': client['frames'],
+                'bytes': client['bytes'],
+                'fps': round(client['fps'], 2)
+            }
+            for client_id, client in list(self.clients.items())
+        }
+
+    def get_subscriber_count(self):
+        """Get the number of connected stream clients"""
+        with self.condition:
+            return self.subscribers
+
+    def wait_for_subscribers(self, active=True, timeout=None):
+        """Block until consumers are attached (or, with active=False, all detached)"""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: (self.subscribers > 0) == active or not self.is_running,
+                timeout
+            )
+            return (self.subscribers > 0) == active
+
+    def close(self):
+        """Stop all streams and wake any waiting clients"""
+        with self.condition:
+            self.is_running = False
+            self.condition.notify_all()
+
+
+class BroadcastOutput(io.BufferedIOBase):
+    """File-like sink that publishes every encoder buffer as a frame"""
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+
+    def writable(self):
+        return True
+
+    def write(self, buf):
+        # publish() copies the data before returning, so the encoder may reuse buf
+        self.broadcaster.publish(buf)
+        return memoryview(buf).nbytes
+
+
+class Picamera2Camera:
+    """Pi camera backend built on picamera2"""
+
+    def __init__(self, size=(640, 480), fps=30, lores_size=None):
+        from picamera2 import Picamera2
+
+        self.size = size
+        self.fps = fps
+        self.picam2 = Picamera2()
+        # Optional second, smaller stream from the same capture (ISP scaled, YUV420)
+        lores = {"size": lores_size} if lores_size else None
+        self.camera_config = self.picam2.create_preview_configuration(
+            main={"size": size},
+            lores=lores,
+            controls={"FrameRate": fps},
+            buffer_count=4
+        )
+        self.picam2.configure(self.camera_config)
+        # Main and lores encoders are started and stopped from their own threads
+        self.lock = threading.Lock()
+        self.encoders = {}
+        self.started = False
+
+    def start(self):
+        """Start the camera for software capture"""
+        with self.lock:
+            self._start()
+
+    def _start(self):
+        if not self.started:
+            self.picam2.start()
+            self.started = True
+
+    def capture_array(self):
+        """Capture one raw frame as a numpy array"""
+        return self.picam2.capture_array()
+
+    def start_encoder(self, output, quality=85, stream='main', fps=None):
+        """Stream encoded JPEGs of one camera stream ('main' or 'lores') straight into output.
+
+        The hardware MJPEG encoder is rate controlled rather than set to a
+        JPEG quality, so quality picks the nearest of picamera2's five
+        quality levels (and the bitrate that goes with it). A stream with
+        a lower fps than the sensor encodes only every Nth frame.
+        """
+        from picamera2.encoders import Quality
+        from picamera2.outputs import FileOutput
+        try:
+            # V4L2 hardware MJPEG encoder (Pi 4 and earlier)
+            from picamera2.encoders import MJPEGEncoder
+            encoder = MJPEGEncoder()
+        except ImportError:
+            from picamera2.encoders import JpegEncoder
+            encoder = JpegEncoder(q=quality)
+        if fps and fps < self.fps:
+            if hasattr(encoder, 'frame_skip_count'):
+                encoder.frame_skip_count = max(1, round(self.fps / fps))
+            else:
+                print("picamera2 cannot skip frames; stream frame rate is only limited per client")
+        for limit, level in ((40, Quality.VERY_LOW), (60, Quality.LOW), (75, Quality.MEDIUM),
+                             (90, Quality.HIGH), (101, Quality.VERY_HIGH)):
+            if quality < limit:
+                break
+        with self.lock:
+            self.picam2.start_encoder(encoder, FileOutput(output), quality=level, name=stream)
+            self.encoders[stream] = encoder
+            self._start()
+
+    def stop_encoder(self, stream='main'):
+        """Stop the encoder stream"""
+        with self.lock:
+            encoder = self.encoders.pop(stream, None)
+            if encoder is not None:
+                self.picam2.stop_encoder(encoder)
+            # Stop the sensor once nothing is being encoded
+            if not self.encoders and self.started:
+                self.picam2.stop()
+                self.started = False
+
+    def close(self):
+        """Release the camera"""
+        self.picam2.close()
+
+
+class FakeCamera:
+    """Synthetic camera backend so the pipeline runs on a plain Linux box"""
+
+    def __init__(self, size=(640, 480), fps=30, lores_size=None):
+        self.sizes = {'main': size}
+        if lores_size:
+            self.sizes['lores'] = lores_size
+        self.fps = fps
+        self.next_frame_time = 0
+
+        # Running encoders: stream name -> (thread, running event)
+        self.encoders = {}
+
+    def start(self):
+        """Start the fake camera"""
+        self.next_frame_time = time.monotonic()
+
+    def _wait_for_frame(self):
+        """Block until the next frame is due, like a real sensor"""
+        delay = self.next_frame_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame_time = max(self.next_frame_time, time.monotonic()) + 1.0 / self.fps
+
+    def _render_frame(self, stream='main'):
+        """Draw a test pattern: dark floor with a swaying white line"""
+        import numpy as np
+
+        # The scene depends only on time, so every stream shows the same picture
+        width, height = self.sizes[stream]
+        frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        offset = int((width // 4) * np.sin(time.monotonic()))
+        center = width // 2 + offset
+        half_width = max(1, width // 64)
+        frame[:, max(0, center - half_width):max(0, center + half_width)] = 255
+        return frame
+
+    def capture_array(self):
+        """Capture one raw frame as a numpy array"""
+        self._wait_for_frame()
+        return self._render_frame()
+
+    def start_encoder(self, output, quality=85, stream='main', fps=None):
+        """Stream encoded JPEGs of one stream into output from a background thread"""
+        import cv2
+
+        period = 1.0 / min(fps or self.fps, self.fps)
+
+        def encoder_loop():
+            next_frame_time = time.monotonic()
+            while running.is_set():
+                delay = next_frame_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_frame_time = max(next_frame_time, time.monotonic()) + period
+                frame = self._render_frame(stream)
+                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                output.write(buffer)
+
+        if stream not in self.sizes:
+            raise ValueError(f"Camera has no {stream} stream")
+        running = threading.Event()
+        running.set()
+        thread = threading.Thread(target=encoder_loop, daemon=True)
+        self.encoders[stream] = (thread, running)
+        thread.start()
+
+    def stop_encoder(self, stream='main'):
+        """Stop the encoder stream"""
+        encoder = self.encoders.pop(stream, None)
+        if encoder is not None:
+            thread, running = encoder
+            running.clear()
+            thread.join()
+
+    def close(self):
+        """Release the camera"""
+        for stream in list(self.encoders):
+            self.stop_encoder(stream)
+
+
+def create_camera(backend='picamera2', size=(640, 480), fps=30, lores_size=None):
+    """Create a camera backend by name"""
+    if backend == 'picamera2':
+        return Picamera2Camera(size, fps, lores_size)
+    elif backend == 'fake':
+        return FakeCamera(size, fps, lores_size)
+    raise ValueError(f"Unknown camera backend: {backend}")
+
+
+class StreamProfile:
+    """Extra, cheaper stream from the same capture: its own size, JPEG quality and frame rate.
+
+    In hardware mode it is encoded from the camera's lores stream, with
+    the encoder skipping frames to reach fps; the hardware MJPEG encoder
+    maps quality to the nearest picamera2 quality level. In software mode
+    the main capture is scaled down to it and encoded at exactly quality.
+    """
+
+    def __init__(self, name, size=(320, 240), quality=50, fps=10):
+        self.name = name
+        self.size = size
+        self.quality = quality
+        self.fps = fps
+        self.broadcaster = FrameBroadcaster(max_fps=fps)
+        self.next_frame_time = 0
+
+    def get_stats(self):
+        return {
+            'size': list(self.size),
+            'quality': self.quality,
+            'fps': self.fps,
+            'clients': self.broadcaster.get_subscriber_count()
+        }
+
+
+# Encode quality levels used when the frame budget is exceeded: (scale, JPEG quality offset)
+QUALITY_LEVELS = [(1.0, 0), (1.0, -20), (0.75, -20), (0.5, -30)]
+
+
+class CameraPipeline:
+    """Capture frames from a camera backend and publish JPEGs to a broadcaster.
+
+    In 'hardware' mode picamera2's encoder writes JPEGs directly into the
+    broadcaster, with no numpy round trip or OpenCV encode. In 'software'
+    mode frames are captured as arrays and encoded with OpenCV on a
+    deadline schedule at the target fps. If the encoder cannot be started
+    the pipeline falls back to software mode.
+
+    Extra StreamProfiles are fed from the same capture. Hardware mode
+    can serve one of them, from the camera's lores stream.
+
+    Either way nothing is captured or encoded for a stream that has no
+    subscribers.
+    """
+
+    def __init__(self, camera, broadcaster, mode='hardware', quality=85, fps=30, profiles=()):
+        self.camera = camera
+        self.broadcaster = broadcaster
+        self.profiles = list(profiles)
+        self.requested_mode = mode
+        self.mode = mode
+        self.quality = quality
+        self.fps = fps
+        self.is_running = False
+        self.threads = []
+
+        # Adaptive quality state (software mode)
+        self.quality_level = 0
+        self.encode_time_avg = 0.0
+        self.over_budget_frames = 0
+        self.under_budget_frames = 0
+
+        # Pipeline statistics (timings in milliseconds)
+        self.deadlines_missed = 0
+        self.capture_time = Histogram()
+        self.encode_time = Histogram()
+        self.idle = True
+
+    def start(self):
+        """Start capturing and publishing frames"""
+        self.is_running = True
+        if self.requested_mode == 'hardware':
+            try:
+                self.camera.start_encoder(BroadcastOutput(self.broadcaster), self.quality)
+                self.camera.stop_encoder()
+                self.mode = 'hardware'
+                self._start_thread(self._encoder_loop, self.broadcaster, self.quality, 'main', self.fps)
+                if self.profiles:
+                    lores = self.profiles[0]
+                    self._start_thread(self._encoder_loop, lores.broadcaster, lores.quality, 'lores', lores.fps)
+                    if len(self.profiles) > 1:
+                        print("Camera has one lores stream; extra stream profiles are not served")
+                print("Camera using hardware JPEG encoding")
+                return
+            except Exception as e:
+                print(f"Hardware JPEG encoding unavailable ({e}), falling back to software")
+
+        self.mode = 'software'
+        self.camera.start()
+        self._start_thread(self._camera_loop)
+        print("Camera using software JPEG encoding")
+
+    def _start_thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _encoder_loop(self, broadcaster, quality, stream, fps):
+        """Run one hardware encoder only while someone is watching its stream"""
+        while self.is_running and broadcaster.is_running:
+            if not broadcaster.wait_for_subscribers(timeout=1.0):
+                continue
+            try:
+                self.camera.start_encoder(BroadcastOutput(broadcaster), quality, stream, fps)
+            except Exception as e:
+                print(f"Camera error: {e}")
+                time.sleep(1)
+                continue
+            if stream == 'main':
+                self.idle = False
+            while self.is_running and broadcaster.is_running:
+                if broadcaster.wait_for_subscribers(active=False, timeout=1.0):
+                    break
+            self.camera.stop_encoder(stream)
+            if stream == 'main':
+                self.idle = True
+
+    def _camera_loop(self):
+        """Camera streaming loop"""
+        import cv2
+
+        period = 1.0 / self.fps
+        deadline = time.monotonic()
+        while self.is_running and self.broadcaster.is_running:
+            try:
+                # Skip capture and encoding entirely while nobody is watching
+                main_watched = self.broadcaster.get_subscriber_count() > 0
+                watched = [profile for profile in self.profiles
+                           if profile.broadcaster.get_subscriber_count() > 0]
+                if not main_watched and not watched:
+                    self.idle = True
+                    # Only the main broadcaster can be waited on; poll when there are other profiles
+                    self.broadcaster.wait_for_subscribers(timeout=0.1 if self.profiles else 1.0)
+                    deadline = time.monotonic()
+                    continue
+                self.idle = False
+
+                # Capture frame
+                capture_start = time.monotonic()
+                raw = self.camera.capture_array()
+                encode_start = time.monotonic()
+                self.capture_time.observe((encode_start - capture_start) * 1000)
+
+                if main_watched:
+                    # Convert to JPEG at the current quality level
+                    scale, quality_offset = QUALITY_LEVELS[self.quality_level]
+                    frame = raw
+                    if scale != 1.0:
+                        frame = cv2.resize(raw, None, fx=scale, fy=scale,
+                                           interpolation=cv2.INTER_AREA)
+                    quality = max(10, self.quality + quality_offset)
+                    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+
+                    # Publish latest frame to stream clients (copied once, straight into the stream part)
+                    self.broadcaster.publish(buffer)
+
+                # Lower profiles are scaled from the same capture, each at its own rate
+                for profile in watched:
+                    if encode_start < profile.next_frame_time:
+                        continue
+                    profile.next_frame_time += 1.0 / profile.fps
+                    if profile.next_frame_time < encode_start:
+                        profile.next_frame_time = encode_start + 1.0 / profile.fps
+                    frame = cv2.resize(raw, profile.size, interpolation=cv2.INTER_AREA)
+                    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, profile.quality])
+                    profile.broadcaster.publish(buffer)
+                encode_time = time.monotonic() - encode_start
+                self.encode_time.observe(encode_time * 1000)
+                self._adapt_quality(encode_time, period)
+
+                # Sleep until the next frame deadline; resync if we fell behind
+                deadline += period
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.deadlines_missed += 1
+                    deadline = time.monotonic()
+            except Exception as e:
+                print(f"Camera error: {e}")
+                time.sleep(1)
+                deadline = time.monotonic()
+
+    def _adapt_quality(self, encode_time, period):
+        """Step quality down when encoding blows the frame budget, back up when it recovers"""
+        self.encode_time_avg = 0.9 * self.encode_time_avg + 0.1 * encode_time
+
+        if self.encode_time_avg > 0.8 * period:
+            self.over_budget_frames += 1
+            self.under_budget_frames = 0
+        elif self.encode_time_avg < 0.4 * period:
+            self.under_budget_frames += 1
+            self.over_budget_frames = 0
+        else:
+            self.over_budget_frames = 0
+            self.under_budget_frames = 0
+
+        if self.over_budget_frames >= self.fps and self.quality_level < len(QUALITY_LEVELS) - 1:
+            self.quality_level += 1
+            self.over_budget_frames = 0
+            print(f"Camera encode over budget, quality level {self.quality_level}")
+        elif self.under_budget_frames >= 5 * self.fps and self.quality_level > 0:
+            self.quality_level -= 1
+            self.under_budget_frames = 0
+            print(f"Camera encode within budget, quality level {self.quality_level}")
+
+    def get_stats(self):
+        """Get camera pipeline statistics"""
+        return {
+            'mode': self.mode,
+            'target_fps': self.fps,
+            'idle': self.idle,
+            'frames_published': self.broadcaster.sequence,
+            'deadlines_missed': self.deadlines_missed,
+            'encode_ms': round(self.encode_time_avg * 1000, 2),
+            'quality_level': self.quality_level,
+            'profiles': {profile.name: profile.get_stats() for profile in self.profiles}
+        }
+
+    def stop(self):
+        """Stop capturing and release the camera"""
+        self.is_running = False
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.camera.close()
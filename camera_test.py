@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Simple camera pipeline test script for Raspberry Pi robot
+Run this to check the camera and JPEG encoding path and measure the frame rate.
+Use --backend fake to run the pipeline on a machine without a Pi camera.
+"""
+
+import argparse
+import time
+from camera_stream import FrameBroadcaster, CameraPipeline, create_camera
+
+def main():
+    parser = argparse.ArgumentParser(description="Camera pipeline test")
+    parser.add_argument('--backend', default='picamera2', choices=['picamera2', 'fake'])
+    parser.add_argument('--mode', default='hardware', choices=['hardware', 'software'])
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print("Raspberry Pi Robot Camera Test")
+    print("==============================")
+
+    broadcaster = FrameBroadcaster()
+    camera = create_camera(args.backend, fps=args.fps)
+    pipeline = CameraPipeline(camera, broadcaster, mode=args.mode, fps=args.fps)
+
+    try:
+        pipeline.start()
+        print(f"Capturing for {args.seconds:.0f} seconds...")
+
+        # The pipeline only runs while someone is subscribed
+        broadcaster.subscribe()
+
+        frames = 0
+        total_bytes = 0
+        sequence = 0
+        start = time.monotonic()
+        while time.monotonic() - start < args.seconds:
+            new_sequence, frame = broadcaster.wait_for_frame(sequence)
+            if new_sequence != sequence and frame is not None:
+                frames += 1
+                total_bytes += len(frame)
+                sequence = new_sequence
+        elapsed = time.monotonic() - start
+        broadcaster.unsubscribe()
+
+        print(f"Encoding mode: {pipeline.mode}")
+        print(f"Frames: {frames} ({frames / elapsed:.1f} FPS)")
+        if frames:
+            print(f"Average frame size: {total_bytes / frames / 1024:.1f} KiB")
+        print(f"Pipeline stats: {pipeline.get_stats()}")
+    except KeyboardInterrupt:
+        print("\nTest stopped by user")
+    finally:
+        pipeline.stop()
+        broadcaster.close()
+        print("Camera test completed")
+
+if __name__ == "__main__":
+    main()
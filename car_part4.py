@@ -1,6 +1,6 @@
 import pygame
 from pygame.locals import *
-import random
+from lane_game import LaneGame, LANES, PLAYER_Y
 
 # Initialize Pygame
 pygame.init()
@@ -25,12 +25,7 @@ marker_width = 10
 marker_height = 50
 
 # Lane coordinates
-left_lane = 150
-center_lane = 250
-right_lane = 350
-
-# lanes
-lanes = [left_lane, center_lane, right_lane]
+left_lane, center_lane, right_lane = LANES
 
 # Road and edge markers
 road = (100, 0, road_width, height)
@@ -38,34 +33,53 @@ left_edge_marker = (95, 0, marker_width, height)
 right_edge_marker = (395, 0, marker_width, height)
 
 # Load the player's car image
-player_car_image = pygame.image.load('images/car.png')
+player_car_image = pygame.image.load('images/car.png').convert_alpha()
 player_car_image = pygame.transform.scale(player_car_image, (50, 100))
-player_x = center_lane
-player_y = 400
-current_lane_index = 1  # Start in the center lane
 
 # Load opponent vehicle images
 vehicle_images = ['images/pickup_truck.png', 'images/taxi.png', 'images/van.png']
-opponent_images = [pygame.image.load(image) for image in vehicle_images]
+opponent_images = [pygame.image.load(image).convert_alpha() for image in vehicle_images]
 
 # Scale opponent vehicles to fit the lanes
 opponent_images = [pygame.transform.scale(image, (50, 100)) for image in opponent_images]
 
-# List to hold opponent vehicles
-opponents = []
+# Game state: lanes, opponents, speed and score (see lane_game.py)
+game = LaneGame()
 
 # Clock for managing frame rate
 clock = pygame.time.Clock()
 fps = 60
 
-# Speed settings
-speed = 2
-
-# Scoring and game states
-score = 0
-game_over = False
 font = pygame.font.Font(None, 36)
 
+# Only redraw and update the parts of the screen that change each frame
+# (set to False to redraw the whole window every frame)
+use_dirty_rects = True
+
+# Pre-render the grass, road and edge markers once
+background = pygame.Surface(screen_size).convert()
+background.fill(green)
+pygame.draw.rect(background, gray, road)
+pygame.draw.rect(background, yellow, left_edge_marker)
+pygame.draw.rect(background, yellow, right_edge_marker)
+
+# Pre-render one lane marker column; it is scrolled by blitting it at an offset
+marker_strip = pygame.Surface((marker_width, height + marker_height * 2)).convert()
+marker_strip.fill(gray)
+for y in range(0, height + marker_height * 2, marker_height * 2):
+    pygame.draw.rect(marker_strip, white, (0, y, marker_width, marker_height))
+marker_columns = [pygame.Rect(left_lane + 45, 0, marker_width, height),
+                  pygame.Rect(center_lane + 45, 0, marker_width, height)]
+
+# Score text is only rendered again when the score changes
+score_text = font.render(f'Score: {game.score}', True, white)
+rendered_score = game.score
+
+# Screen areas drawn last frame, to be restored from the background
+previous_rects = []
+screen.blit(background, (0, 0))
+pygame.display.update()
+
 # Main game loop
 running = True
 while running:
@@ -75,91 +89,73 @@ while running:
     for event in pygame.event.get():
         if event.type == QUIT:
             running = False
-        if game_over and event.type == KEYDOWN:
+        if game.game_over and event.type == KEYDOWN:
             if event.key == K_y:  # Restart game
-                game_over = False
-                score = 0
-                speed = 2
-                opponents = []
-                player_x = center_lane
-                player_y = 400
-                current_lane_index = 1
+                game.reset()
+                # Clear the game over message
+                screen.blit(background, (0, 0))
+                pygame.display.update()
+                previous_rects = []
             elif event.key == K_n:  # Quit game
                 running = False
-        if not game_over and event.type == KEYDOWN:
-            if event.key == K_LEFT and current_lane_index > 0:
-                current_lane_index -= 1
-                player_x = lanes[current_lane_index]
-            if event.key == K_RIGHT and current_lane_index < 2:
-                current_lane_index += 1
-                player_x = lanes[current_lane_index]
+        if not game.game_over and event.type == KEYDOWN:
+            if event.key == K_LEFT:
+                game.change_lane(-1)
+            if event.key == K_RIGHT:
+                game.change_lane(1)
 
     # Skip the rest of the loop if the game is over
-    if game_over:
+    if game.game_over:
         continue
 
-    # Draw the grass
-    screen.fill(green)
-
-    # Draw the road
-    pygame.draw.rect(screen, gray, road)
-
-    # Draw the edge markers
-    pygame.draw.rect(screen, yellow, left_edge_marker)
-    pygame.draw.rect(screen, yellow, right_edge_marker)
+    # Spawn, move and score opponents, and detect collisions
+    game.step()
+
+    if use_dirty_rects:
+        # Restore what was drawn last frame from the cached background
+        for rect in previous_rects:
+            screen.blit(background, rect, rect)
+    else:
+        # Draw the grass, road and edge markers
+        screen.blit(background, (0, 0))
+    drawn_rects = []
     
-    # Draw lane markers
+    # Draw lane markers by scrolling the pre-rendered strip
     lane_marker_move_y = (pygame.time.get_ticks() // 10) % (marker_height * 2)
-    for y in range(-marker_height * 2, height, marker_height * 2):
-        pygame.draw.rect(screen, white, (left_lane + 45, y + lane_marker_move_y, marker_width, marker_height))
-        pygame.draw.rect(screen, white, (center_lane + 45, y + lane_marker_move_y, marker_width, marker_height))
-
+    for column in marker_columns:
+        screen.blit(marker_strip, (column.x, lane_marker_move_y - marker_height * 2))
+        drawn_rects.append(column)
 
     # Draw the player's car
-    player_rect = player_car_image.get_rect(center=(player_x, player_y))
-    screen.blit(player_car_image, player_rect)
-
-    # Add a new opponent vehicle
-    if len(opponents) < 3 and random.randint(1, 50) == 1:  # Random chance to spawn vehicles
-        lane = random.choice(lanes)
-        opponent_image = random.choice(opponent_images)
-        opponent_rect = opponent_image.get_rect(center=(lane, -50))  # Start above the screen
-        opponents.append((opponent_image, opponent_rect))
-
-    # Move opponent vehicles
-    for vehicle in opponents[:]:
-        vehicle_image, vehicle_rect = vehicle
-        vehicle_rect.y += speed  # Move down the screen
-
-        # Remove vehicles that move off-screen and increase score
-        if vehicle_rect.top > height:
-            opponents.remove(vehicle)
-            score += 1  # Increment score for avoiding the vehicle
-
-            # Increase game speed every 5 points
-            if score % 5 == 0:
-                speed += 1
-
-        # Detect collision
-        if player_rect.colliderect(vehicle_rect):
-            game_over = True
+    player_rect = player_car_image.get_rect(center=(game.player_x, PLAYER_Y))
+    drawn_rects.append(screen.blit(player_car_image, player_rect))
 
-        # Draw the opponent vehicles
-        screen.blit(vehicle_image, vehicle_rect)
+    # Draw the opponent vehicles
+    for lane, y, kind in game.opponents:
+        vehicle_image = opponent_images[kind]
+        vehicle_rect = vehicle_image.get_rect(center=(LANES[lane], y))
+        drawn_rects.append(screen.blit(vehicle_image, vehicle_rect))
 
     # Display the score
-    score_text = font.render(f'Score: {score}', True, white)
-    screen.blit(score_text, (10, 10))
+    if game.score != rendered_score:
+        score_text = font.render(f'Score: {game.score}', True, white)
+        rendered_score = game.score
+    drawn_rects.append(screen.blit(score_text, (10, 10)))
 
     # Check if the game is over
-    if game_over:
+    if game.game_over:
         # Display Game Over message
         pygame.draw.rect(screen, red, (50, 200, 400, 100))
         game_over_text = font.render('Game Over! Play Again? (Y/N)', True, white)
         screen.blit(game_over_text, (70, 240))
+        drawn_rects.append(pygame.Rect(50, 200, 400, 100))
 
     # Update the display
-    pygame.display.update()
+    if use_dirty_rects:
+        pygame.display.update(previous_rects + drawn_rects)
+    else:
+        pygame.display.update()
+    previous_rects = drawn_rects
 
 # Quit Pygame
 pygame.quit()
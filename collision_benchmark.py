@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Collision benchmark for the plane game
+Compares pygame.sprite.groupcollide with the SpatialHash broad phase in gameRole.py
+"""
+
+import argparse
+import os
+import random
+import time
+
+# Surfaces only, no window needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+from gameRole import SCREEN_WIDTH, SCREEN_HEIGHT, BulletPool, Enemy, SpatialHash
+
+BULLET_SIZE = (9, 21)
+ENEMY_SIZE = (57, 43)
+
+def build_scene(count, seed=0):
+    """Make count bullets and count enemies spread over the playfield"""
+    rng = random.Random(seed)
+    bullet_img = pygame.Surface(BULLET_SIZE)
+    enemy_img = pygame.Surface(ENEMY_SIZE)
+
+    bullets = BulletPool(capacity=count)
+    enemies = pygame.sprite.Group()
+    for _ in range(count):
+        bullets.spawn(bullet_img, (rng.randrange(SCREEN_WIDTH), rng.randrange(SCREEN_HEIGHT)))
+        enemies.add(Enemy(enemy_img, [], (rng.randrange(SCREEN_WIDTH - ENEMY_SIZE[0]),
+                                          rng.randrange(SCREEN_HEIGHT))))
+    return bullets, enemies
+
+def run_groupcollide(bullets, enemies, frames):
+    """Move everything and test every bullet against every enemy, each frame"""
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        bullets.move()
+        for enemy in enemies:
+            enemy.move()
+        hits += len(pygame.sprite.groupcollide(bullets, enemies, False, False))
+    return hits, time.perf_counter() - start
+
+def run_spatial_hash(bullets, enemies, frames):
+    """Same frames, with the enemies kept in a SpatialHash that move() updates"""
+    grid = SpatialHash()
+    grid.add(enemies)
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        bullets.move()
+        for enemy in enemies:
+            enemy.move()
+        hits += len(grid.collide(bullets))
+    elapsed = time.perf_counter() - start
+    grid.empty()
+    return hits, elapsed
+
+def check_same_hits(count, seed):
+    """Both methods must find exactly the same collisions"""
+    bullets, enemies = build_scene(count, seed)
+    grid = SpatialHash()
+    grid.add(enemies)
+    expected = pygame.sprite.groupcollide(bullets, enemies, False, False)
+    found = grid.collide(bullets)
+    grid.empty()
+    return ({bullet: set(hit) for bullet, hit in expected.items()}
+            == {bullet: set(hit) for bullet, hit in found.items()})
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare groupcollide with the spatial hash")
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 50, 100, 250, 500, 1000],
+                        help="bullets and enemies on screen (each)")
+    parser.add_argument('--frames', type=int, default=100, help="frames per run")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    pygame.init()
+    print(f"{'entities':>9} {'groupcollide':>14} {'spatial hash':>14} {'speedup':>8}  hits")
+    for count in args.counts:
+        if not check_same_hits(count, args.seed):
+            print(f"{count:>9}  results differ!")
+            continue
+        brute_hits, brute = run_groupcollide(*build_scene(count, args.seed), args.frames)
+        grid_hits, grid = run_spatial_hash(*build_scene(count, args.seed), args.frames)
+        print(f"{count:>9} {brute * 1000 / args.frames:>11.3f} ms {grid * 1000 / args.frames:>11.3f} ms "
+              f"{brute / grid:>7.1f}x  {brute_hits}/{grid_hits}")
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import threading
+import time
+from metrics import RateMeter
+
+class CommandMailbox:
+    """Single-slot mailbox: posting a command replaces any command not yet taken"""
+
+    def __init__(self):
+        self.command = None
+        self.condition = threading.Condition()
+        self.is_open = True
+
+        # Mailbox statistics
+        self.posted = 0
+        self.coalesced = 0
+
+    def post(self, command):
+        """Post a command, replacing the pending one if there is one"""
+        with self.condition:
+            if self.command is not None:
+                self.coalesced += 1
+            self.command = command
+            self.posted += 1
+            self.condition.notify()
+
+    def take(self, timeout=None):
+        """Wait for and remove the pending command (None on timeout or close)"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.command is not None or not self.is_open, timeout)
+            command = self.command
+            self.command = None
+            return command
+
+    def close(self):
+        """Close the mailbox and wake the consumer"""
+        with self.condition:
+            self.is_open = False
+            self.condition.notify_all()
+
+
+class ActuationThread:
+    """Dedicated thread that applies only the freshest motor command.
+
+    HTTP handlers call submit() and return immediately. Commands that
+    arrive while one is being applied are coalesced so the motors always
+    act on the latest input rather than a backlog of stale ones.
+    """
+
+    def __init__(self, name='actuation'):
+        self.mailbox = CommandMailbox()
+        self.is_running = True
+
+        # Actuation statistics
+        self.executed = 0
+        self.errors = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.submit_rate = RateMeter()
+
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args):
+        """Queue func(*args) to run on the actuation thread"""
+        self.mailbox.post((func, args, time.monotonic()))
+        self.submit_rate.mark()
+
+    def _run(self):
+        """Actuation loop"""
+        while self.is_running:
+            command = self.mailbox.take(timeout=1.0)
+            if command is None:
+                continue
+
+            func, args, posted_at = command
+            try:
+                func(*args)
+            except Exception as e:
+                self.errors += 1
+                print(f"Actuation error: {e}")
+            latency = time.monotonic() - posted_at
+            self.executed += 1
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def get_stats(self):
+        """Get command queue statistics"""
+        return {
+            'posted': self.mailbox.posted,
+            'executed': self.executed,
+            'coalesced': self.mailbox.coalesced,
+            'rate_hz': round(self.submit_rate.rate(), 2),
+            'errors': self.errors,
+            'last_latency_ms': round(self.last_latency * 1000, 2),
+            'max_latency_ms': round(self.max_latency * 1000, 2)
+        }
+
+    def stop(self):
+        """Stop the actuation thread"""
+        self.is_running = False
+        self.mailbox.close()
+        self.thread.join(timeout=2)
@@ -0,0 +1,80 @@
+import json
+import math
+import time
+
+# Compact text frames accepted on the control channel:
+#   j,<x>,<y>,<magnitude>   joystick input
+#   c,<action>              forward, backward, left, right or stop
+#   m,<mode>                change operation mode
+#   s                       request status now
+#   k                       keepalive: hold the current command past the watchdog
+# The server replies with JSON: status pushes and error messages only.
+
+class ControlChannel:
+    """Persistent WebSocket control session for one client"""
+
+    def __init__(self, robot, status_interval=0.5):
+        self.robot = robot
+        self.status_interval = status_interval
+
+        # Session statistics
+        self.frames_received = 0
+        self.frames_rejected = 0
+
+    def handle_frame(self, frame):
+        """Apply one control frame; returns a reply dict or None"""
+        self.frames_received += 1
+        fields = frame.strip().split(',')
+        kind = fields[0]
+
+        try:
+            if kind == 'j' and len(fields) == 4:
+                x, y, magnitude = (float(value) for value in fields[1:])
+                if not all(math.isfinite(value) for value in (x, y, magnitude)):
+                    raise ValueError("non-finite joystick value")
+                self.robot.submit_joystick(x, y, magnitude)
+                return None
+            elif kind == 'c' and len(fields) == 2:
+                if self.robot.submit_action(fields[1]):
+                    return None
+                return self._error('Invalid action')
+            elif kind == 'm' and len(fields) == 2:
+                if self.robot.set_mode(fields[1]):
+                    return self._status()
+                return self._error('Invalid mode')
+            elif kind == 's':
+                return self._status()
+            elif kind == 'k':
+                self.robot.motors.feed_watchdog()
+                return None
+        except ValueError:
+            pass
+
+        return self._error('Invalid frame')
+
+    def serve(self, ws):
+        """Run the session until the client disconnects"""
+        next_status = time.monotonic()
+        while True:
+            timeout = max(0, next_status - time.monotonic())
+            frame = ws.receive(timeout=timeout)
+            if frame is not None:
+                if isinstance(frame, bytes):
+                    frame = frame.decode('utf-8', 'replace')
+                reply = self.handle_frame(frame)
+                if reply is not None:
+                    ws.send(json.dumps(reply))
+
+            # Push status periodically so the client never has to poll
+            if time.monotonic() >= next_status:
+                ws.send(json.dumps(self._status()))
+                next_status = time.monotonic() + self.status_interval
+
+    def _status(self):
+        status = self.robot.get_status()
+        status['type'] = 'status'
+        return status
+
+    def _error(self, message):
+        self.frames_rejected += 1
+        return {'type': 'error', 'message': message}
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Simple WebSocket control channel test script for Raspberry Pi robot
+Run this to check /ws/control: it sends j, c, m, s and k frames and checks the replies
+and status pushes. Use --local to test against a simulated robot started by this script.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+def start_local_robot():
+    """Serve a simulated robot on a free local port; returns (robot, server, url)"""
+    # Module settings are read at import time
+    os.environ.setdefault('ROBOT_GPIO_BACKEND', 'simulated')
+    os.environ.setdefault('ROBOT_CAMERA_BACKEND', 'fake')
+    os.environ.setdefault('ROBOT_TELEMETRY_FILE', '')
+    from robot_controller import RobotController, create_app
+    from server import IsolatedWSGIServer
+
+    robot = RobotController()
+    robot.start_hardware()
+    server = IsolatedWSGIServer('127.0.0.1', 0, create_app(robot))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return robot, server, f'ws://127.0.0.1:{server.server_port}/ws/control'
+
+def wait_for(ws, match, timeout=2.0):
+    """Read messages until one satisfies match; returns it, or None on timeout"""
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        message = ws.receive(timeout=remaining)
+        if message is None:
+            continue
+        message = json.loads(message)
+        if match(message):
+            return message
+
+def is_status(message):
+    return message.get('type') == 'status'
+
+def is_error(text):
+    return lambda message: message.get('type') == 'error' and message.get('message') == text
+
+def drive_target(message):
+    motors = message.get('motors', {})
+    return motors.get('drive_target')
+
+def run_checks(ws):
+    """Run every check; returns the number of failures"""
+    failures = 0
+
+    def check(name, ok):
+        nonlocal failures
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+        if not ok:
+            failures += 1
+
+    check("status is pushed without asking", wait_for(ws, is_status) is not None)
+
+    ws.send('s')
+    check("s: status reply", wait_for(ws, is_status, timeout=1.0) is not None)
+
+    ws.send('m,MANUAL')
+    check("m,MANUAL: status in MANUAL mode",
+          wait_for(ws, lambda m: is_status(m) and m.get('mode') == 'MANUAL') is not None)
+
+    ws.send('m,FLYING')
+    check("m,FLYING: rejected", wait_for(ws, is_error('Invalid mode')) is not None)
+
+    ws.send('j,0,0.8,0.8')
+    check("j: joystick sets a drive target",
+          wait_for(ws, lambda m: is_status(m) and any(drive_target(m) or ())) is not None)
+
+    ws.send('k')
+    check("k: keepalive accepted", wait_for(ws, lambda m: m.get('type') == 'error', timeout=1.0) is None)
+
+    ws.send('c,stop')
+    check("c,stop: drive target back to zero",
+          wait_for(ws, lambda m: is_status(m) and drive_target(m) is not None
+                   and not any(drive_target(m))) is not None)
+
+    ws.send('c,fly')
+    check("c,fly: rejected", wait_for(ws, is_error('Invalid action')) is not None)
+
+    ws.send('x')
+    check("x: rejected", wait_for(ws, is_error('Invalid frame')) is not None)
+
+    ws.send('j,nan,0,1')
+    check("j,nan,0,1: rejected", wait_for(ws, is_error('Invalid frame')) is not None)
+
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket control channel test")
+    parser.add_argument('--url', default='ws://localhost:5000/ws/control')
+    parser.add_argument('--local', action='store_true',
+                        help="start a simulated robot in this process and test that")
+    args = parser.parse_args()
+
+    import simple_websocket
+
+    print("Raspberry Pi Robot Control Channel Test")
+    print("=======================================")
+
+    robot = server = None
+    url = args.url
+    if args.local:
+        robot, server, url = start_local_robot()
+    print(f"Connecting to {url}")
+
+    failures = 1
+    try:
+        ws = simple_websocket.Client.connect(url)
+        try:
+            failures = run_checks(ws)
+        finally:
+            ws.close()
+    except (OSError, simple_websocket.ConnectionError) as e:
+        print(f"Connection failed: {e}")
+    except KeyboardInterrupt:
+        print("\nTest stopped by user")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            robot.cleanup()
+
+    print("Control channel test passed" if not failures else f"Control channel test failed ({failures})")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
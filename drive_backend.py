@@ -0,0 +1,298 @@
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+
+# GPIO backend, selectable at startup through the environment
+GPIO_BACKEND = os.environ.get('ROBOT_GPIO_BACKEND', 'rpi')  # rpi or simulated
+
+HIGH = 1
+LOW = 0
+
+class RPiGPIOBackend:
+    """GPIO backend for the Raspberry Pi using RPi.GPIO"""
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+
+        self.GPIO = GPIO
+        self.pwms = {}
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)
+
+    def setup_output(self, pin):
+        self.GPIO.setup(pin, self.GPIO.OUT)
+
+    def output(self, pin, value):
+        self.GPIO.output(pin, self.GPIO.HIGH if value else self.GPIO.LOW)
+
+    def pwm_start(self, pin, frequency, duty_cycle=0):
+        pwm = self.GPIO.PWM(pin, frequency)
+        pwm.start(duty_cycle)
+        self.pwms[pin] = pwm
+
+    def pwm_set_duty_cycle(self, pin, duty_cycle):
+        self.pwms[pin].ChangeDutyCycle(duty_cycle)
+
+    def pwm_stop(self, pin):
+        pwm = self.pwms.pop(pin, None)
+        if pwm is not None:
+            pwm.stop()
+
+    def cleanup(self):
+        for pin in list(self.pwms):
+            self.pwm_stop(pin)
+        self.GPIO.cleanup()
+
+
+class SimulatedGPIOBackend:
+    """In-memory GPIO backend that records every pin and PWM transition.
+
+    Events are (timestamp, kind, pin, value) tuples using time.monotonic(),
+    so the control path can be benchmarked and regression-tested on a
+    machine without GPIO.
+    """
+
+    def __init__(self, max_events=10000):
+        self.levels = {}
+        self.duty_cycles = {}
+        self.frequencies = {}
+        self.events = deque(maxlen=max_events)
+        self.lock = threading.Lock()
+
+    def _record(self, kind, pin, value):
+        with self.lock:
+            self.events.append((time.monotonic(), kind, pin, value))
+
+    def setup_output(self, pin):
+        self.levels[pin] = LOW
+        self._record('setup', pin, LOW)
+
+    def output(self, pin, value):
+        self.levels[pin] = HIGH if value else LOW
+        self._record('output', pin, self.levels[pin])
+
+    def pwm_start(self, pin, frequency, duty_cycle=0):
+        self.frequencies[pin] = frequency
+        self.duty_cycles[pin] = duty_cycle
+        self._record('pwm_start', pin, duty_cycle)
+
+    def pwm_set_duty_cycle(self, pin, duty_cycle):
+        self.duty_cycles[pin] = duty_cycle
+        self._record('pwm_duty', pin, duty_cycle)
+
+    def pwm_stop(self, pin):
+        self.duty_cycles.pop(pin, None)
+        self.frequencies.pop(pin, None)
+        self._record('pwm_stop', pin, 0)
+
+    def cleanup(self):
+        self.levels.clear()
+        self._record('cleanup', None, None)
+
+    def get_events(self):
+        """Get a copy of the recorded events"""
+        with self.lock:
+            return list(self.events)
+
+    def clear_events(self):
+        """Forget all recorded events"""
+        with self.lock:
+            self.events.clear()
+
+
+class ShadowGPIO:
+    """Write-elision layer over a GPIO backend.
+
+    Keeps a shadow copy of every output level and PWM duty cycle and only
+    touches the hardware when a value actually changes. Inside batch(),
+    writes are collected and flushed once at the end, so a pin that is
+    set several times within one command costs at most one write.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.levels = {}
+        self.duty_cycles = {}
+        self.pending = None
+        self.batch_depth = 0
+        self.lock = threading.RLock()
+
+        # Write statistics
+        self.writes_issued = 0
+        self.writes_elided = 0
+
+    def __getattr__(self, name):
+        # Backend-specific helpers (e.g. get_events) pass straight through
+        return getattr(self.backend, name)
+
+    def setup_output(self, pin):
+        with self.lock:
+            # Level after setup is unknown, so the next write always goes out
+            self.levels.pop(pin, None)
+            self.backend.setup_output(pin)
+
+    def output(self, pin, value):
+        self._write('output', pin, HIGH if value else LOW)
+
+    def pwm_start(self, pin, frequency, duty_cycle=0):
+        with self.lock:
+            self.backend.pwm_start(pin, frequency, duty_cycle)
+            self.duty_cycles[pin] = duty_cycle
+            # PWM now owns the pin, so its digital level is unknown
+            self.levels.pop(pin, None)
+
+    def pwm_set_duty_cycle(self, pin, duty_cycle):
+        self._write('pwm_duty', pin, duty_cycle)
+
+    def pwm_stop(self, pin):
+        with self.lock:
+            self.backend.pwm_stop(pin)
+            self.duty_cycles.pop(pin, None)
+
+    def cleanup(self):
+        with self.lock:
+            self.backend.cleanup()
+            self.levels.clear()
+            self.duty_cycles.clear()
+
+    def _write(self, kind, pin, value):
+        with self.lock:
+            if self.pending is not None:
+                # Later writes to the same pin replace earlier ones in the batch
+                if (kind, pin) in self.pending:
+                    self.writes_elided += 1
+                    del self.pending[(kind, pin)]
+                self.pending[(kind, pin)] = value
+            else:
+                self._apply(kind, pin, value)
+
+    def _apply(self, kind, pin, value):
+        shadow = self.levels if kind == 'output' else self.duty_cycles
+        if shadow.get(pin) == value:
+            self.writes_elided += 1
+            return
+        if kind == 'output':
+            self.backend.output(pin, value)
+        else:
+            self.backend.pwm_set_duty_cycle(pin, value)
+        shadow[pin] = value
+        self.writes_issued += 1
+
+    def batch(self):
+        """Context manager that groups writes into one flush"""
+        return _GPIOBatch(self)
+
+    def get_stats(self):
+        """Get write-elision statistics"""
+        with self.lock:
+            return {
+                'writes_issued': self.writes_issued,
+                'writes_elided': self.writes_elided
+            }
+
+
+class _GPIOBatch:
+    def __init__(self, gpio):
+        self.gpio = gpio
+
+    def __enter__(self):
+        self.gpio.lock.acquire()
+        if self.gpio.batch_depth == 0:
+            self.gpio.pending = {}
+        self.gpio.batch_depth += 1
+        return self.gpio
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.gpio.batch_depth -= 1
+            if self.gpio.batch_depth == 0:
+                pending = self.gpio.pending
+                self.gpio.pending = None
+                for (kind, pin), value in pending.items():
+                    self.gpio._apply(kind, pin, value)
+        finally:
+            self.gpio.lock.release()
+        return False
+
+
+def create_backend(name=None, elide_writes=True):
+    """Create a GPIO backend by name, wrapped in the write-elision layer"""
+    if name is None:
+        name = GPIO_BACKEND
+    if name == 'rpi':
+        backend = RPiGPIOBackend()
+    elif name == 'simulated':
+        backend = SimulatedGPIOBackend()
+    else:
+        raise ValueError(f"Unknown GPIO backend: {name}")
+    return ShadowGPIO(backend) if elide_writes else backend
+
+
+class DifferentialDrive:
+    """Two DC motors on an L298N-style driver: two direction pins and a PWM enable per side"""
+
+    def __init__(self, backend, pwm_freq=1000,
+                 left_pins=(17, 27, 22), right_pins=(18, 23, 24)):
+        # Pins are (enable, input 1, input 2) for each motor
+        self.backend = backend
+        self.pwm_freq = pwm_freq
+        self.pins = {'left': left_pins, 'right': right_pins}
+
+        for enable, in1, in2 in self.pins.values():
+            backend.setup_output(enable)
+            backend.setup_output(in1)
+            backend.setup_output(in2)
+
+        # Start PWM with 0% duty cycle
+        for enable, _, _ in self.pins.values():
+            backend.pwm_start(enable, pwm_freq, 0)
+
+    def set_motor(self, motor, speed, direction):
+        """Set one motor's speed (0-100) and direction (-1 backward, 0 stop, 1 forward)"""
+        enable, in1, in2 = self.pins[motor]
+        if direction == 1:  # Forward
+            self.backend.output(in1, HIGH)
+            self.backend.output(in2, LOW)
+        elif direction == -1:  # Backward
+            self.backend.output(in1, LOW)
+            self.backend.output(in2, HIGH)
+        else:  # Stop
+            self.backend.output(in1, LOW)
+            self.backend.output(in2, LOW)
+        self.backend.pwm_set_duty_cycle(enable, speed)
+
+    def set_motors(self, left_speed, left_direction, right_speed, right_direction):
+        """Set both motors"""
+        with self.batch():
+            self.set_motor('left', left_speed, left_direction)
+            self.set_motor('right', right_speed, right_direction)
+
+    def batch(self):
+        """Group writes into one flush when the backend supports it"""
+        if hasattr(self.backend, 'batch'):
+            return self.backend.batch()
+        return contextlib.nullcontext()
+
+    def forward(self, speed=100):
+        self.set_motors(speed, 1, speed, 1)
+
+    def backward(self, speed=100):
+        self.set_motors(speed, -1, speed, -1)
+
+    def left(self, speed=100):
+        self.set_motors(speed, -1, speed, 1)
+
+    def right(self, speed=100):
+        self.set_motors(speed, 1, speed, -1)
+
+    def stop(self):
+        self.set_motors(0, 0, 0, 0)
+
+    def cleanup(self):
+        """Stop the motors and release the GPIO"""
+        self.stop()
+        for enable, _, _ in self.pins.values():
+            self.backend.pwm_stop(enable)
+        self.backend.cleanup()
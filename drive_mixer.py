@@ -0,0 +1,93 @@
+import math
+
+# All values here are normalized: -1.0 is full reverse, 1.0 is full forward.
+
+def clamp(value, low=-1.0, high=1.0):
+    # NaN compares false both ways and would come out of min() as high
+    if math.isnan(value):
+        return 0.0
+    return max(low, min(high, value))
+
+def apply_deadzone(value, deadzone):
+    """Zero out small inputs and rescale the rest so output still starts at 0"""
+    if abs(value) <= deadzone:
+        return 0.0
+    return math.copysign((abs(value) - deadzone) / (1.0 - deadzone), value)
+
+def apply_expo(value, expo):
+    """Blend linear and cubic response: fine control near center, full range at the edge"""
+    return (1.0 - expo) * value + expo * value ** 3
+
+def arcade_mix(throttle, turn):
+    """Mix throttle and turn into left/right motor outputs"""
+    left = throttle + turn
+    right = throttle - turn
+    # Scale down together so turning keeps its ratio at full throttle
+    scale = max(1.0, abs(left), abs(right))
+    return left / scale, right / scale
+
+def tank_mix(left, right):
+    """Drive each side directly from its own stick"""
+    return clamp(left), clamp(right)
+
+
+class SlewRateLimiter:
+    """Limit how fast a value may change, in full-scale units per second"""
+
+    def __init__(self, rate, value=0.0):
+        self.rate = rate
+        self.value = value
+
+    def step(self, target, dt):
+        max_step = self.rate * dt
+        self.value += clamp(target - self.value, -max_step, max_step)
+        return self.value
+
+    def reset(self, value=0.0):
+        self.value = value
+
+
+class DriveMixer:
+    """Differential-drive mixing engine.
+
+    Stick inputs are shaped (dead-zone, then expo), mixed into left/right
+    targets, and update() walks the outputs toward the targets no faster
+    than the slew rate. update() is meant to be called from a fixed-rate
+    control tick.
+    """
+
+    def __init__(self, deadzone=0.1, expo=0.3, slew_rate=2.0):
+        self.deadzone = deadzone
+        self.expo = expo
+        self.target = (0.0, 0.0)
+        self.left_limiter = SlewRateLimiter(slew_rate)
+        self.right_limiter = SlewRateLimiter(slew_rate)
+
+    def shape(self, value):
+        return apply_expo(apply_deadzone(clamp(value), self.deadzone), self.expo)
+
+    def set_arcade(self, throttle, turn):
+        """Set targets from a throttle axis and a turn axis"""
+        self.target = arcade_mix(self.shape(throttle), self.shape(turn))
+
+    def set_tank(self, left, right):
+        """Set targets from one stick per side"""
+        self.target = tank_mix(self.shape(left), self.shape(right))
+
+    def set_target(self, left, right):
+        """Set left/right targets directly, without input shaping"""
+        self.target = (clamp(left), clamp(right))
+
+    def update(self, dt):
+        """Advance the outputs by one control tick and return (left, right)"""
+        left, right = self.target
+        return self.left_limiter.step(left, dt), self.right_limiter.step(right, dt)
+
+    def get_output(self):
+        return self.left_limiter.value, self.right_limiter.value
+
+    def reset(self):
+        """Drop targets and outputs to zero immediately"""
+        self.target = (0.0, 0.0)
+        self.left_limiter.reset()
+        self.right_limiter.reset()
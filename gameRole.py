@@ -5,6 +5,7 @@ Created on Wed Sep 11 16:36:03 2013
 @author: Leo
 """
 
+import time
 import pygame
 
 SCREEN_WIDTH = 480
@@ -14,8 +15,130 @@ TYPE_SMALL = 1
 TYPE_MIDDLE = 2
 TYPE_BIG = 3
 
+BULLET_POOL_SIZE = 64       # 同时在屏幕上的子弹上限
+
+# 图集缓存：每张图集的每个矩形只转换一次，所有玩家、敌人和子弹共享同一个 Surface
+sheet_cache = {}            # 文件名 -> 已加载的图集
+image_cache = {}            # (图集, 矩形) -> 转换后的子图
+
+def loadSheet(filename):
+    sheet = sheet_cache.get(filename)
+    if sheet is None:
+        sheet = sheet_cache[filename] = pygame.image.load(filename).convert_alpha()
+    return sheet
+
+def getImage(sheet, rect):
+    key = (sheet, tuple(rect))
+    image = image_cache.get(key)
+    if image is None:
+        image = image_cache[key] = sheet.subsurface(rect).convert_alpha()
+    return image
+
+# 启动时预加载所有精灵图片，返回 (新转换的图片数量, 耗时毫秒)
+def preloadImages(sheet, rects):
+    start = time.perf_counter()
+    count = len(image_cache)
+    for rect in rects:
+        getImage(sheet, rect)
+    return len(image_cache) - count, (time.perf_counter() - start) * 1000
+
+GRID_CELL_SIZE = 64         # 空间哈希网格单元的边长（像素）
+
+# 空间哈希：把 SCREEN_WIDTH x SCREEN_HEIGHT 的游戏区域划分为均匀网格，做子弹与敌人的粗略碰撞检测。
+# 它本身也是一个精灵组，所以 kill() 会自动把精灵从网格中移除；精灵的 move() 会增量更新所在单元。
+# 精灵可以同时属于多个空间哈希，所属的哈希记录在 sprite.spatial_hashes 中。
+class SpatialHash(pygame.sprite.Group):
+    def __init__(self, cell_size=GRID_CELL_SIZE, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+        pygame.sprite.Group.__init__(self)
+        self.cell_size = cell_size
+        self.cols = (width + cell_size - 1) // cell_size
+        self.rows = (height + cell_size - 1) // cell_size
+        self.cells = [set() for i in range(self.cols * self.rows)]    # 每个单元中的精灵
+        self.sprite_cells = {}                          # 精灵 -> 所在单元范围 (x0, y0, x1, y1)
+
+    def cellRange(self, rect):
+        # 屏幕外的部分归入边缘单元
+        size = self.cell_size
+        x0 = min(max(rect.left // size, 0), self.cols - 1)
+        x1 = min(max((rect.right - 1) // size, 0), self.cols - 1)
+        y0 = min(max(rect.top // size, 0), self.rows - 1)
+        y1 = min(max((rect.bottom - 1) // size, 0), self.rows - 1)
+        return x0, y0, x1, y1
+
+    def cellIndices(self, cell_range):
+        x0, y0, x1, y1 = cell_range
+        cols = self.cols
+        return [y * cols + x for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+    def add_internal(self, sprite, layer=None):
+        pygame.sprite.Group.add_internal(self, sprite)
+        cell_range = self.cellRange(sprite.rect)
+        for index in self.cellIndices(cell_range):
+            self.cells[index].add(sprite)
+        self.sprite_cells[sprite] = cell_range
+        # 每次生成新的 frozenset，kill() 遍历时修改也是安全的
+        sprite.spatial_hashes = getattr(sprite, 'spatial_hashes', frozenset()) | {self}
+
+    def remove_internal(self, sprite):
+        pygame.sprite.Group.remove_internal(self, sprite)
+        for index in self.cellIndices(self.sprite_cells.pop(sprite)):
+            self.cells[index].discard(sprite)
+        sprite.spatial_hashes = sprite.spatial_hashes - {self}
+
+    def moveSprite(self, *sprites):
+        # 精灵移动后调用；只有跨越单元边界时才修改网格
+        for sprite in sprites:
+            old_range = self.sprite_cells.get(sprite)
+            if old_range is None:
+                continue
+            new_range = self.cellRange(sprite.rect)
+            if new_range == old_range:
+                continue
+            cells = self.cells
+            for index in self.cellIndices(old_range):
+                cells[index].discard(sprite)
+            for index in self.cellIndices(new_range):
+                cells[index].add(sprite)
+            self.sprite_cells[sprite] = new_range
+
+    def query(self, rect):
+        # 返回与 rect 所在单元相同的所有精灵（候选，未做精确检测）
+        indices = self.cellIndices(self.cellRange(rect))
+        if len(indices) == 1:
+            return set(self.cells[indices[0]])
+        found = set()
+        for index in indices:
+            found |= self.cells[index]
+        return found
+
+    def candidatePairs(self, sprites):
+        # 返回 (sprite, 网格中的精灵) 候选对列表，例如子弹与敌人
+        pairs = []
+        for sprite in sprites:
+            for other in self.query(sprite.rect):
+                pairs.append((sprite, other))
+        return pairs
+
+    def collide(self, sprites, dokill_sprite=False, dokill_other=False):
+        # 与 pygame.sprite.groupcollide(sprites, self, ...) 的结果相同：{sprite: [被撞到的精灵]}
+        hits = {}
+        for sprite in list(sprites):
+            rect = sprite.rect
+            collided = [other for other in self.query(rect) if rect.colliderect(other.rect)]
+            if collided:
+                hits[sprite] = collided
+        for sprite, collided in hits.items():
+            if dokill_sprite:
+                sprite.kill()
+            if dokill_other:
+                for other in collided:
+                    other.kill()
+        return hits
+
 # 子弹类
 class Bullet(pygame.sprite.Sprite):
+    spatial_hashes = frozenset()                        # 所在的空间哈希
+
     def __init__(self, bullet_img, init_pos):
         pygame.sprite.Sprite.__init__(self)
         self.image = bullet_img
@@ -25,24 +148,85 @@ class Bullet(pygame.sprite.Sprite):
 
     def move(self):
         self.rect.top -= self.speed
+        if self.rect.bottom < 0:                        # 飞出屏幕顶部后移出所有精灵组（子弹池会回收）
+            self.kill()
+        else:
+            for grid in self.spatial_hashes:
+                grid.moveSprite(self)
+
+    def remove_internal(self, group):
+        pygame.sprite.Sprite.remove_internal(self, group)
+        # 只离开子弹池（remove() 而不是 kill()）时子弹已被回收，也要离开空间哈希
+        if isinstance(group, BulletPool):
+            for grid in self.spatial_hashes:
+                grid.remove(self)
+
+# 子弹池：容量固定，飞出屏幕或被 kill() 的子弹放回空闲列表重复使用
+class BulletPool(pygame.sprite.Group):
+    def __init__(self, capacity=BULLET_POOL_SIZE, spatial_hash=None):
+        pygame.sprite.Group.__init__(self)
+        self.capacity = capacity
+        self.free = []                                  # 空闲的子弹
+        self.created = 0                                # 已创建的子弹数量
+        self.spatial_hash = spatial_hash                # 新发射的子弹同时加入该空间哈希（可选）
+
+    def spawn(self, bullet_img, init_pos):
+        if self.free:
+            bullet = self.free.pop()
+            bullet.image = bullet_img
+            bullet.rect.size = bullet_img.get_size()
+            bullet.rect.midbottom = init_pos
+        elif self.created < self.capacity:
+            bullet = Bullet(bullet_img, init_pos)
+            self.created += 1
+        else:
+            return None                                 # 子弹池已满，本次不发射
+        self.add(bullet)
+        if self.spatial_hash is not None:
+            self.spatial_hash.add(bullet)
+        return bullet
+
+    def remove_internal(self, sprite):
+        # 子弹离开子弹池时（kill()、remove() 或 groupcollide 命中）回收到空闲列表
+        pygame.sprite.Group.remove_internal(self, sprite)
+        self.free.append(sprite)
+
+    def move(self):
+        # 批量移动所有子弹，不逐个调用 Bullet.move()
+        culled = []
+        moved = []
+        for bullet in self.sprites():
+            rect = bullet.rect
+            rect.top -= bullet.speed
+            if rect.bottom < 0:
+                culled.append(bullet)
+            elif bullet.spatial_hashes:
+                moved.append(bullet)
+        for bullet in culled:
+            bullet.kill()
+        for bullet in moved:
+            for grid in bullet.spatial_hashes:
+                grid.moveSprite(bullet)
 
 # 玩家类
 class Player(pygame.sprite.Sprite):
     def __init__(self, plane_img, player_rect, init_pos):
         pygame.sprite.Sprite.__init__(self)
-        self.image = []                                 # 用来存储玩家对象精灵图片的列表
+        self.image = []                                 # 用来存储玩家对象精灵图片的列表（来自图集缓存）
         for i in range(len(player_rect)):
-            self.image.append(plane_img.subsurface(player_rect[i]).convert_alpha())
-        self.rect = player_rect[0]                      # 初始化图片所在的矩形
+            self.image.append(getImage(plane_img, player_rect[i]))
+        self.rect = pygame.Rect(player_rect[0])         # 初始化图片所在的矩形（复制，不修改图集中的矩形）
         self.rect.topleft = init_pos                    # 初始化矩形的左上角坐标
         self.speed = 8                                  # 初始化玩家速度，这里是一个确定的值
-        self.bullets = pygame.sprite.Group()            # 玩家飞机所发射的子弹的集合
+        self.bullets = BulletPool()                     # 玩家飞机所发射的子弹的集合（子弹池）
         self.img_index = 0                              # 玩家精灵图片索引
         self.is_hit = False                             # 玩家是否被击中
 
     def shoot(self, bullet_img):
-        bullet = Bullet(bullet_img, self.rect.midtop)
-        self.bullets.add(bullet)
+        self.bullets.spawn(bullet_img, self.rect.midtop)
+
+    def moveBullets(self):
+        self.bullets.move()
 
     def moveUp(self):
         if self.rect.top <= 0:
@@ -70,6 +254,8 @@ class Player(pygame.sprite.Sprite):
 
 # 敌人类
 class Enemy(pygame.sprite.Sprite):
+    spatial_hashes = frozenset()                        # 所在的空间哈希
+
     def __init__(self, enemy_img, enemy_down_imgs, init_pos):
        pygame.sprite.Sprite.__init__(self)
        self.image = enemy_img
@@ -80,4 +266,6 @@ class Enemy(pygame.sprite.Sprite):
        self.down_index = 0
 
     def move(self):
-        self.rect.top += self.speed
\ No newline at end of file
+        self.rect.top += self.speed
+        for grid in self.spatial_hashes:
+            grid.moveSprite(self)
\ No newline at end of file
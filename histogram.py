@@ -0,0 +1,62 @@
+import bisect
+import threading
+
+# Default bucket upper bounds in milliseconds
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+class Histogram:
+    """Fixed-bucket histogram of durations in milliseconds"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        """Record one value"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, fraction):
+        """Approximate percentile: the upper bound of the bucket holding it"""
+        with self.lock:
+            if self.count == 0:
+                return 0.0
+            rank = fraction * self.count
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                if seen >= rank:
+                    return bound
+            return self.max
+
+    def summary(self):
+        """Get count, mean, max, percentiles and bucket counts"""
+        p50 = self.percentile(0.5)
+        p99 = self.percentile(0.99)
+        with self.lock:
+            return {
+                'count': self.count,
+                'mean': round(self.total / self.count, 3) if self.count else 0.0,
+                'max': round(self.max, 3),
+                'p50': p50,
+                'p99': p99,
+                'buckets': {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                'overflow': self.counts[-1]
+            }
+
+    def reset(self):
+        """Forget all recorded values"""
+        with self.lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
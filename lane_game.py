@@ -0,0 +1,205 @@
+import argparse
+import random
+import time
+
+# Game geometry, shared with the pygame front end in car_part4.py
+WIDTH = 500
+HEIGHT = 500
+LANES = [150, 250, 350]
+CAR_WIDTH = 50
+CAR_HEIGHT = 100
+PLAYER_Y = 400           # centre of the player's car
+SPAWN_Y = -50            # opponents start centred just above the screen
+MAX_OPPONENTS = 3
+SPAWN_CHANCE = 50        # one in SPAWN_CHANCE per frame while there is room
+START_SPEED = 2
+SPEED_UP_EVERY = 5       # speed goes up by one every this many points
+VEHICLE_KINDS = 3
+
+# Opponents are removed once their top edge passes the bottom of the screen
+OFFSCREEN_Y = HEIGHT + CAR_HEIGHT // 2
+
+
+class LaneGame:
+    """Lane dodging game logic without any drawing.
+
+    One step() is one frame: the player may change lane, opponents may
+    spawn, every opponent moves down by the current speed, opponents that
+    leave the screen score a point, and touching one ends the game.
+    Positions are car centres in screen pixels.
+    """
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        self.lane = 1
+        self.opponents = []    # [lane index, centre y, vehicle kind]
+        self.score = 0
+        self.speed = START_SPEED
+        self.game_over = False
+        self.frames = 0
+
+    @property
+    def player_x(self):
+        return LANES[self.lane]
+
+    def change_lane(self, direction):
+        """Move the player one lane left (-1) or right (+1)"""
+        if not self.game_over:
+            self.lane = min(len(LANES) - 1, max(0, self.lane + direction))
+
+    def step(self, action=0):
+        """Advance one frame after applying action (-1 left, 0 stay, 1 right); returns game_over"""
+        if self.game_over:
+            return True
+        if action:
+            self.change_lane(action)
+        self.frames += 1
+
+        # Add a new opponent vehicle
+        if len(self.opponents) < MAX_OPPONENTS and self.random.randint(1, SPAWN_CHANCE) == 1:
+            lane = self.random.randrange(len(LANES))
+            kind = self.random.randrange(VEHICLE_KINDS)
+            self.opponents.append([lane, SPAWN_Y, kind])
+
+        # Move opponents, score the ones that leave the screen
+        passed = 0
+        for opponent in self.opponents:
+            opponent[1] += self.speed
+            if opponent[1] > OFFSCREEN_Y:
+                passed += 1
+            elif opponent[0] == self.lane and abs(opponent[1] - PLAYER_Y) < CAR_HEIGHT:
+                self.game_over = True
+        if passed:
+            self.opponents = [opponent for opponent in self.opponents if opponent[1] <= OFFSCREEN_Y]
+            self._add_score(passed)
+        return self.game_over
+
+    def _add_score(self, points):
+        for _ in range(points):
+            self.score += 1
+            if self.score % SPEED_UP_EVERY == 0:
+                self.speed += 1
+
+
+class BatchLaneGame:
+    """Many independent lane games stepped together with NumPy.
+
+    All state is held in arrays with one row per game, and step() advances
+    every game by one frame with whole-array operations. Finished games
+    stay finished (and stop changing) until reset() is called for them.
+    """
+
+    def __init__(self, count, seed=None):
+        import numpy as np
+
+        self.count = count
+        self.rng = np.random.default_rng(seed)
+        self.lane = np.ones(count, dtype=np.int8)
+        self.opponent_lane = np.zeros((count, MAX_OPPONENTS), dtype=np.int8)
+        self.opponent_y = np.zeros((count, MAX_OPPONENTS), dtype=np.int32)
+        self.opponent_active = np.zeros((count, MAX_OPPONENTS), dtype=bool)
+        self.score = np.zeros(count, dtype=np.int32)
+        self.speed = np.full(count, START_SPEED, dtype=np.int32)
+        self.game_over = np.zeros(count, dtype=bool)
+        self.frames = np.zeros(count, dtype=np.int64)
+
+    def reset(self, mask=None):
+        """Restart all games, or only those where mask is True"""
+        import numpy as np
+
+        if mask is None:
+            mask = np.ones(self.count, dtype=bool)
+        self.lane[mask] = 1
+        self.opponent_active[mask] = False
+        self.score[mask] = 0
+        self.speed[mask] = START_SPEED
+        self.game_over[mask] = False
+        self.frames[mask] = 0
+
+    def step(self, actions=None):
+        """Advance every running game one frame; actions is an array of -1, 0 or 1 per game.
+
+        Returns the game_over array.
+        """
+        import numpy as np
+
+        running = ~self.game_over
+        if actions is not None:
+            moved = np.clip(self.lane + np.asarray(actions, dtype=np.int8), 0, len(LANES) - 1)
+            self.lane = np.where(running, moved, self.lane).astype(np.int8)
+        self.frames += running
+
+        # Spawn into the first free slot of games with room
+        free = ~self.opponent_active
+        spawn = running & free.any(axis=1) & (self.rng.integers(1, SPAWN_CHANCE + 1, self.count) == 1)
+        rows = np.flatnonzero(spawn)
+        slots = free[rows].argmax(axis=1)
+        self.opponent_active[rows, slots] = True
+        self.opponent_lane[rows, slots] = self.rng.integers(0, len(LANES), rows.size)
+        self.opponent_y[rows, slots] = SPAWN_Y
+
+        # Move every active opponent of every running game
+        moving = self.opponent_active & running[:, None]
+        self.opponent_y += np.where(moving, self.speed[:, None], 0).astype(np.int32)
+
+        # Score and retire opponents that left the screen
+        passed = moving & (self.opponent_y > OFFSCREEN_Y)
+        self.opponent_active &= ~passed
+        points = passed.sum(axis=1)
+        old_score = self.score.copy()
+        self.score += points
+        self.speed += self.score // SPEED_UP_EVERY - old_score // SPEED_UP_EVERY
+
+        # Collision mask: same lane and overlapping vertically
+        hit = (self.opponent_active & running[:, None]
+               & (self.opponent_lane == self.lane[:, None])
+               & (np.abs(self.opponent_y - PLAYER_Y) < CAR_HEIGHT))
+        self.game_over |= hit.any(axis=1)
+        return self.game_over
+
+    def observe(self):
+        """Current state as arrays: lane, opponent lanes/y/active mask, speed"""
+        return {
+            'lane': self.lane.copy(),
+            'opponent_lane': self.opponent_lane.copy(),
+            'opponent_y': self.opponent_y.copy(),
+            'opponent_active': self.opponent_active.copy(),
+            'speed': self.speed.copy()
+        }
+
+
+def dodge_policy(game):
+    """Example autopilot: leave the lane of the nearest opponent ahead"""
+    import numpy as np
+
+    ahead = (game.opponent_active & (game.opponent_lane == game.lane[:, None])
+             & (game.opponent_y < PLAYER_Y) & (game.opponent_y > PLAYER_Y - 3 * CAR_HEIGHT))
+    threatened = ahead.any(axis=1)
+    # Move towards the centre lane, or out of it to the left
+    direction = np.where(game.lane == 0, 1, -1)
+    return np.where(threatened, direction, 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run lane games headless and report throughput")
+    parser.add_argument('--games', type=int, default=10000, help="games simulated in lockstep")
+    parser.add_argument('--frames', type=int, default=3000, help="frames per game")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    game = BatchLaneGame(args.games, seed=args.seed)
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        game.step(dodge_policy(game))
+    elapsed = time.perf_counter() - start
+
+    frames = int(game.frames.sum())
+    print(f"Simulated {frames} game frames in {elapsed:.2f} s "
+          f"({frames / elapsed / 60:.0f}x real time at 60 fps)")
+    print(f"Games over: {int(game.game_over.sum())}/{args.games}, "
+          f"mean score {game.score.mean():.2f}, max score {game.score.max()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import threading
+import time
+from drive_backend import HIGH, LOW, ShadowGPIO
+
+# Patterns are lists of (value, seconds) steps: value is a level for
+# on/off patterns or a duty cycle (0-100) for PWM patterns.
+
+def blink_pattern(interval=0.5):
+    return [(HIGH, interval), (LOW, interval)]
+
+def fade_pattern(period=2.0, steps=20):
+    """Triangle wave of duty cycles: off -> full -> off over one period"""
+    half = steps // 2
+    ramp = [round(100 * i / half) for i in range(half)]
+    levels = ramp + [100] + ramp[:0:-1]
+    return [(level, period / len(levels)) for level in levels]
+
+
+class LEDScheduler:
+    """Single thread that drives every LED pattern from a timer heap.
+
+    Starting a pattern is O(1) plus a heap push, not a thread spawn.
+    Cancellation is deterministic: set() or a new pattern bumps the pin's
+    generation under the lock, so no step of the old pattern can touch
+    the pin afterwards.
+    """
+
+    def __init__(self, gpio, pwm_freq=200):
+        self.gpio = gpio
+        self.pwm_freq = pwm_freq
+
+        # Share the write-elision layer's RLock, so LED writes and batched
+        # motor writes never wait on each other in opposite order. Other
+        # backends may take their own (non-reentrant) lock inside output(),
+        # so they get a lock of the scheduler's own.
+        lock = gpio.lock if isinstance(gpio, ShadowGPIO) else threading.RLock()
+        self.condition = threading.Condition(lock)
+        self.heap = []                 # (due time, tie-breaker, pin, generation)
+        self.patterns = {}             # pin -> [generation, steps, next index, repeat, pwm]
+        self.generations = {}
+        self.pwm_pins = set()
+        self.counter = itertools.count()
+
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, name='leds', daemon=True)
+        self.thread.start()
+
+    def set(self, pin, state):
+        """Cancel any pattern on pin and set it on or off"""
+        with self.condition:
+            self._cancel(pin)
+            self._release_pwm(pin)
+            self.gpio.output(pin, HIGH if state else LOW)
+
+    def blink(self, pin, interval=0.5):
+        """Blink pin until cancelled"""
+        self.run({pin: blink_pattern(interval)})
+
+    def fade(self, pin, period=2.0):
+        """Fade pin up and down through PWM until cancelled"""
+        self.run({pin: fade_pattern(period)}, pwm=True)
+
+    def run(self, pin_patterns, repeat=True, pwm=False):
+        """Start patterns on one or more pins, in step with each other"""
+        with self.condition:
+            now = time.monotonic()
+            for pin, steps in pin_patterns.items():
+                self._cancel(pin)
+                if pwm and pin not in self.pwm_pins:
+                    self.gpio.pwm_start(pin, self.pwm_freq, 0)
+                    self.pwm_pins.add(pin)
+                elif not pwm:
+                    self._release_pwm(pin)
+                self.patterns[pin] = [self.generations[pin], steps, 0, repeat, pwm]
+                self._step(pin, now)
+            self.condition.notify()
+
+    def cancel(self, pin):
+        """Stop the pattern on pin, leaving its output as it is"""
+        with self.condition:
+            self._cancel(pin)
+
+    def _cancel(self, pin):
+        # Stale heap entries are skipped when their generation no longer matches
+        self.generations[pin] = self.generations.get(pin, 0) + 1
+        self.patterns.pop(pin, None)
+
+    def _release_pwm(self, pin):
+        if pin in self.pwm_pins:
+            self.gpio.pwm_stop(pin)
+            self.pwm_pins.discard(pin)
+
+    def _step(self, pin, now):
+        """Apply the pattern's next step and schedule the one after"""
+        pattern = self.patterns[pin]
+        generation, steps, index, repeat, pwm = pattern
+        value, duration = steps[index]
+        if pwm:
+            self.gpio.pwm_set_duty_cycle(pin, value)
+        else:
+            self.gpio.output(pin, value)
+
+        index += 1
+        if index == len(steps):
+            if not repeat:
+                # Non-repeating sequences hold their last value
+                del self.patterns[pin]
+                return
+            index = 0
+        pattern[2] = index
+        heapq.heappush(self.heap, (now + duration, next(self.counter), pin, generation))
+
+    def _run(self):
+        """Scheduler loop"""
+        with self.condition:
+            while self.is_running:
+                now = time.monotonic()
+                while self.heap and self.heap[0][0] <= now:
+                    due, _, pin, generation = heapq.heappop(self.heap)
+                    if pin in self.patterns and self.generations.get(pin) == generation:
+                        # Schedule from the due time, not now, so patterns do not drift
+                        self._step(pin, due)
+                timeout = self.heap[0][0] - now if self.heap else None
+                self.condition.wait(timeout)
+
+    def get_stats(self):
+        """Get scheduler statistics"""
+        with self.condition:
+            return {
+                'active_patterns': len(self.patterns),
+                'pending_steps': len(self.heap)
+            }
+
+    def stop(self):
+        """Cancel all patterns and stop the scheduler thread"""
+        with self.condition:
+            for pin in list(self.patterns):
+                self._cancel(pin)
+            for pin in list(self.pwm_pins):
+                self._release_pwm(pin)
+            self.is_running = False
+            self.condition.notify()
+        self.thread.join(timeout=1)
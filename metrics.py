@@ -0,0 +1,132 @@
+import threading
+import time
+from histogram import Histogram
+
+class RateMeter:
+    """Events per second over a sliding window of one-second buckets"""
+
+    def __init__(self, window=10):
+        self.window = window
+        self.buckets = [0] * window
+        self.bucket_times = [0] * window
+        self.lock = threading.Lock()
+
+    def mark(self, count=1):
+        second = int(time.monotonic())
+        index = second % self.window
+        with self.lock:
+            if self.bucket_times[index] != second:
+                self.bucket_times[index] = second
+                self.buckets[index] = 0
+            self.buckets[index] += count
+
+    def rate(self):
+        """Average events per second over the last full window"""
+        now = int(time.monotonic())
+        with self.lock:
+            total = sum(count for count, second in zip(self.buckets, self.bucket_times)
+                        if now - self.window < second < now)
+        return total / (self.window - 1)
+
+
+class RequestMetrics:
+    """Per-route request counts and latency histograms for a Flask app"""
+
+    def __init__(self):
+        self.latency = {}    # route -> Histogram (milliseconds)
+        self.requests = {}   # (route, method, status) -> count
+        self.lock = threading.Lock()
+
+    def install(self, app):
+        """Time every request through Flask's request hooks"""
+        from flask import g, request
+
+        @app.before_request
+        def start_timer():
+            g.metrics_start = time.monotonic()
+
+        @app.after_request
+        def record_request(response):
+            start = g.pop('metrics_start', None)
+            if start is not None:
+                route = request.url_rule.rule if request.url_rule else 'unmatched'
+                self.observe(route, request.method, response.status_code,
+                             (time.monotonic() - start) * 1000)
+            return response
+
+    def observe(self, route, method, status, duration_ms):
+        with self.lock:
+            histogram = self.latency.get(route)
+            if histogram is None:
+                histogram = self.latency[route] = Histogram()
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+        histogram.observe(duration_ms)
+
+    def collect(self):
+        """Get the request metric families"""
+        with self.lock:
+            requests = list(self.requests.items())
+            latency = list(self.latency.items())
+        return [
+            metric('robot_http_requests_total', 'counter', 'HTTP requests by route, method and status',
+                   [({'route': route, 'method': method, 'status': str(status)}, count)
+                    for (route, method, status), count in requests]),
+            metric('robot_http_request_duration_seconds', 'histogram',
+                   'Time to produce the HTTP response (streams: time to first byte)',
+                   [({'route': route}, histogram) for route, histogram in latency])
+        ]
+
+
+# A metric family is a dict with name, type, help and a list of (labels, value)
+# samples; for histograms the value is a Histogram in milliseconds.
+
+def metric(name, metric_type, help_text, samples):
+    return {'name': name, 'type': metric_type, 'help': help_text, 'samples': samples}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + (extra or [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+def format_prometheus(families):
+    """Render metric families in the Prometheus text exposition format"""
+    lines = []
+    for family in families:
+        name = family['name']
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for labels, value in family['samples']:
+            if family['type'] == 'histogram':
+                # Histograms are kept in milliseconds and exported in seconds
+                summary = value.summary()
+                cumulative = 0
+                for bound, count in summary['buckets'].items():
+                    cumulative += count
+                    le = [('le', repr(float(bound) / 1000))]
+                    lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {summary['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value.total / 1000}")
+                lines.append(f"{name}_count{_format_labels(labels)} {summary['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+def format_json(families):
+    """Render metric families as a JSON-friendly dict"""
+    result = {}
+    for family in families:
+        samples = []
+        for labels, value in family['samples']:
+            if family['type'] == 'histogram':
+                summary = value.summary()
+                summary.pop('buckets')
+                samples.append({'labels': labels, 'ms': summary})
+            else:
+                samples.append({'labels': labels, 'value': value})
+        result[family['name']] = samples
+    return result
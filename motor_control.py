@@ -1,9 +1,14 @@
-import RPi.GPIO as GPIO
+import contextlib
 import time
 import threading
+from drive_backend import DifferentialDrive, create_backend, HIGH, LOW
+from drive_mixer import DriveMixer
+from histogram import Histogram
+from led_scheduler import LEDScheduler
 
 class MotorControl:
-    def __init__(self):
+    def __init__(self, gpio_backend=None, pwm_freq=1000, control_rate=100, command_timeout=1.0,
+                 telemetry=None):
         # GPIO pin definitions for motor driver
         self.MOTOR_A_ENABLE = 17  # PWM for left motor speed
         self.MOTOR_A_IN1 = 27     # Left motor direction 1
@@ -17,7 +22,34 @@ class MotorControl:
         self.BACK_LED_PIN = 12    # GPIO12 for back LEDs
         
         # PWM frequency
-        self.PWM_FREQ = 1000
+        self.PWM_FREQ = pwm_freq
+        
+        # Control tick rate (Hz); motor outputs only change on a tick
+        self.CONTROL_RATE = control_rate
+        
+        # Joystick mixing: 'arcade' (left stick turns, right stick drives) or 'tank'
+        self.DRIVE_MODE = 'arcade'
+        self.mixer = DriveMixer(deadzone=0.1, expo=0.3, slew_rate=2.0)
+        self.applied_output = (0.0, 0.0)
+        
+        # Optional structured event log
+        self.telemetry = telemetry
+        
+        # Command watchdog: stop if no fresh command arrives within this many seconds (0 disables).
+        # It only guards continuous commands (joysticks, WebSocket, autonomous setpoints);
+        # a direction button is a single POST and holds until the next command.
+        self.COMMAND_TIMEOUT = command_timeout
+        self.last_command_time = time.monotonic()
+        self.watchdog_armed = False
+        self.watchdog_trips = 0
+        
+        # Control loop timing instrumentation (milliseconds)
+        self.setpoint_time = None          # When the pending setpoint arrived
+        self.control_ticks = 0
+        self.control_overruns = 0          # Ticks that missed their deadline
+        self.period_jitter = Histogram()   # |actual period - nominal period|
+        self.handler_latency = Histogram() # Time spent inside control_tick
+        self.actuation_latency = Histogram()  # Setpoint arrival to the tick that applies it
         
         # Motor speed limits
         self.MAX_SPEED = 100
@@ -35,48 +67,47 @@ class MotorControl:
         self.right_joystick_x = 0
         self.right_joystick_y = 0
         
-        # Threading lock for motor control
-        self.motor_lock = threading.Lock()
+        # Threading lock for motor control (re-entrant so a command can hold it across calls)
+        self.motor_lock = threading.RLock()
         
         # Emergency stop flag
         self.emergency_stop = False
         
-        # LED control threads and flags
-        self.front_led_blinking = False
-        self.back_led_blinking = False
-        self.front_led_thread = None
-        self.back_led_thread = None
-        self.led_lock = threading.Lock()
-        
+        self.gpio = create_backend(gpio_backend)
         self.setup_gpio()
+        
+        # Start the control tick
+        self.control_running = True
+        self.control_thread = threading.Thread(target=self._control_loop, daemon=True)
+        self.control_thread.start()
     
     def setup_gpio(self):
         """Initialize GPIO pins for motor control"""
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setwarnings(False)
-        
-        # Setup motor control pins
-        motor_pins = [
-            self.MOTOR_A_ENABLE, self.MOTOR_A_IN1, self.MOTOR_A_IN2,
-            self.MOTOR_B_ENABLE, self.MOTOR_B_IN3, self.MOTOR_B_IN4
-        ]
-        
-        for pin in motor_pins:
-            GPIO.setup(pin, GPIO.OUT)
+        # Setup motor control pins and PWM for speed control
+        self.drive = DifferentialDrive(
+            self.gpio, pwm_freq=self.PWM_FREQ,
+            left_pins=(self.MOTOR_A_ENABLE, self.MOTOR_A_IN1, self.MOTOR_A_IN2),
+            right_pins=(self.MOTOR_B_ENABLE, self.MOTOR_B_IN3, self.MOTOR_B_IN4)
+        )
         
         # Setup LED pins
-        GPIO.setup(self.FRONT_LED_PIN, GPIO.OUT)
-        GPIO.setup(self.BACK_LED_PIN, GPIO.OUT)
-        GPIO.output(self.FRONT_LED_PIN, GPIO.LOW)
-        GPIO.output(self.BACK_LED_PIN, GPIO.LOW)
+        self.gpio.setup_output(self.FRONT_LED_PIN)
+        self.gpio.setup_output(self.BACK_LED_PIN)
+        self.gpio.output(self.FRONT_LED_PIN, LOW)
+        self.gpio.output(self.BACK_LED_PIN, LOW)
         
-        # Setup PWM for speed control
-        self.pwm_a = GPIO.PWM(self.MOTOR_A_ENABLE, self.PWM_FREQ)
-        self.pwm_b = GPIO.PWM(self.MOTOR_B_ENABLE, self.PWM_FREQ)
+        # One scheduler thread drives all LED patterns
+        self.leds = LEDScheduler(self.gpio)
         
-        # Start PWM with 0% duty cycle
-        self.pwm_a.start(0)
-        self.pwm_b.start(0)
+        # Turn indicator sequences: a chase from front to back for left, back to front for right
+        self.LEFT_INDICATOR = {
+            self.FRONT_LED_PIN: [(HIGH, 0.2), (LOW, 0.6)],
+            self.BACK_LED_PIN: [(LOW, 0.2), (HIGH, 0.2), (LOW, 0.4)]
+        }
+        self.RIGHT_INDICATOR = {
+            self.BACK_LED_PIN: [(HIGH, 0.2), (LOW, 0.6)],
+            self.FRONT_LED_PIN: [(LOW, 0.2), (HIGH, 0.2), (LOW, 0.4)]
+        }
         
         print("Motor control GPIO initialized")
     
@@ -101,95 +132,68 @@ class MotorControl:
         # Clamp speed to valid range
         speed = max(self.MIN_SPEED, min(self.MAX_SPEED, speed))
         
-        if motor == 'left':
-            if direction == 1:  # Forward
-                GPIO.output(self.MOTOR_A_IN1, GPIO.HIGH)
-                GPIO.output(self.MOTOR_A_IN2, GPIO.LOW)
-            elif direction == -1:  # Backward
-                GPIO.output(self.MOTOR_A_IN1, GPIO.LOW)
-                GPIO.output(self.MOTOR_A_IN2, GPIO.HIGH)
-            else:  # Stop
-                GPIO.output(self.MOTOR_A_IN1, GPIO.LOW)
-                GPIO.output(self.MOTOR_A_IN2, GPIO.LOW)
-            
-            self.pwm_a.ChangeDutyCycle(speed)
-            
-        elif motor == 'right':
-            if direction == 1:  # Forward
-                GPIO.output(self.MOTOR_B_IN3, GPIO.HIGH)
-                GPIO.output(self.MOTOR_B_IN4, GPIO.LOW)
-            elif direction == -1:  # Backward
-                GPIO.output(self.MOTOR_B_IN3, GPIO.LOW)
-                GPIO.output(self.MOTOR_B_IN4, GPIO.HIGH)
-            else:  # Stop
-                GPIO.output(self.MOTOR_B_IN3, GPIO.LOW)
-                GPIO.output(self.MOTOR_B_IN4, GPIO.LOW)
-            
-            self.pwm_b.ChangeDutyCycle(speed)
+        if motor in ('left', 'right'):
+            self.drive.set_motor(motor, speed, direction)
+    
+    def blink_led(self, pin, interval=0.5):
+        """Blink an LED until it is set or given another pattern"""
+        self.leds.blink(pin, interval)
+    
+    def fade_led(self, pin, period=2.0):
+        """Fade an LED up and down through PWM until it is set or given another pattern"""
+        self.leds.fade(pin, period)
     
-    def _blink_led(self, pin, blink_flag_attr, interval=0.5):
-        """Internal method to blink an LED on a given pin while the flag is True."""
-        while getattr(self, blink_flag_attr):
-            GPIO.output(pin, GPIO.HIGH)
-            time.sleep(interval)
-            GPIO.output(pin, GPIO.LOW)
-            time.sleep(interval)
-        GPIO.output(pin, GPIO.LOW)
-
-    def _start_blinking_led(self, pin, blink_flag_attr, thread_attr, interval=0.5):
-        with self.led_lock:
-            setattr(self, blink_flag_attr, True)
-            if getattr(self, thread_attr) is None or not getattr(self, thread_attr).is_alive():
-                t = threading.Thread(target=self._blink_led, args=(pin, blink_flag_attr, interval))
-                t.daemon = True
-                setattr(self, thread_attr, t)
-                t.start()
-
-    def _stop_blinking_led(self, pin, blink_flag_attr, thread_attr):
-        with self.led_lock:
-            setattr(self, blink_flag_attr, False)
-            GPIO.output(pin, GPIO.LOW)
-
     def _set_led(self, pin, state):
-        GPIO.output(pin, GPIO.HIGH if state else GPIO.LOW)
+        self.leds.set(pin, state)
+    
+    @contextlib.contextmanager
+    def _command(self):
+        """Hold the motor lock and flush all GPIO writes of one command together"""
+        with self.motor_lock, self.drive.batch():
+            yield
     
     def move_forward(self, speed=None):
         """Move robot forward"""
         if speed is None:
             speed = self.MAX_SPEED
-        self.set_motor_speed('left', speed, 1)
-        self.set_motor_speed('right', speed, 1)
-        # Turn both LEDs ON
-        self._set_led(self.FRONT_LED_PIN, True)
-        self._set_led(self.BACK_LED_PIN, True)
+        with self._command():
+            self._set_drive_target(speed, speed)
+            # Turn both LEDs ON
+            self._set_led(self.FRONT_LED_PIN, True)
+            self._set_led(self.BACK_LED_PIN, True)
     
     def move_backward(self, speed=None):
         """Move robot backward"""
         if speed is None:
             speed = self.MAX_SPEED
-        self.set_motor_speed('left', speed, -1)
-        self.set_motor_speed('right', speed, -1)
-        # Turn both LEDs ON
-        self._set_led(self.FRONT_LED_PIN, True)
-        self._set_led(self.BACK_LED_PIN, True)
+        with self._command():
+            self._set_drive_target(-speed, -speed)
+            # Turn both LEDs ON
+            self._set_led(self.FRONT_LED_PIN, True)
+            self._set_led(self.BACK_LED_PIN, True)
     
     def turn_left(self, speed=None):
         """Turn robot left"""
         if speed is None:
             speed = self.MAX_SPEED
-        self.set_motor_speed('left', speed, -1)
-        self.set_motor_speed('right', speed, 1)
+        with self._command():
+            self._set_drive_target(-speed, speed)
+            self.leds.run(self.LEFT_INDICATOR)
     
     def turn_right(self, speed=None):
         """Turn robot right"""
         if speed is None:
             speed = self.MAX_SPEED
-        self.set_motor_speed('left', speed, 1)
-        self.set_motor_speed('right', speed, -1)
+        with self._command():
+            self._set_drive_target(speed, -speed)
+            self.leds.run(self.RIGHT_INDICATOR)
     
     def stop_all(self):
         """Stop all motors"""
-        with self.motor_lock:
+        with self._command():
+            # Stop is immediate, not ramped
+            self.mixer.reset()
+            self.applied_output = (0.0, 0.0)
             self.left_speed = 0
             self.right_speed = 0
             self.left_direction = 0
@@ -198,39 +202,137 @@ class MotorControl:
             # Stop both motors
             self._control_motor('left', 0, 0)
             self._control_motor('right', 0, 0)
-        # Turn both LEDs OFF
-        self._set_led(self.FRONT_LED_PIN, False)
-        self._set_led(self.BACK_LED_PIN, False)
+            # Turn both LEDs OFF
+            self._set_led(self.FRONT_LED_PIN, False)
+            self._set_led(self.BACK_LED_PIN, False)
     
     def set_joystick_control(self, left_x, left_y, right_x, right_y):
-        """Control motors: right joystick for forward/back, left joystick for left/right turning only."""
+        """Set the drive target from both joysticks; the control tick ramps the motors to it.
+
+        In arcade mode the left stick turns and the right stick drives; in
+        tank mode each stick's Y axis drives its own side.
+        """
         if self.emergency_stop:
             self.stop_all()
             return
         
-        # Left joystick: left/right turning only
-        turn = left_x
-        # Right joystick: forward/back only
-        move = right_y
+        self.left_joystick_x = left_x
+        self.left_joystick_y = left_y
+        self.right_joystick_x = right_x
+        self.right_joystick_y = right_y
         
-        if abs(turn) > 0.1:  # Prioritize turning if left joystick is used
-            speed = abs(turn) * self.MAX_SPEED
-            direction = 1 if turn > 0 else -1
-            if direction > 0:
-                # Turn right in place
-                self.set_motor_speed('left', speed, 1)
-                self.set_motor_speed('right', speed, -1)
-            else:
-                # Turn left in place
-                self.set_motor_speed('left', speed, -1)
-                self.set_motor_speed('right', speed, 1)
-        elif abs(move) > 0.1:
-            speed = abs(move) * self.MAX_SPEED
-            direction = 1 if move > 0 else -1
-            self.set_motor_speed('left', speed, direction)
-            self.set_motor_speed('right', speed, direction)
+        if self.DRIVE_MODE == 'tank':
+            self.mixer.set_tank(left_y, right_y)
         else:
+            self.mixer.set_arcade(right_y, left_x)
+        self.setpoint_time = self.last_command_time = time.monotonic()
+        self.watchdog_armed = True
+    
+    def set_drive(self, throttle, turn):
+        """Set the drive target from a single stick (throttle and turn in -1..1)"""
+        if self.emergency_stop:
             self.stop_all()
+            return
+        self.mixer.set_arcade(throttle, turn)
+        self.setpoint_time = self.last_command_time = time.monotonic()
+        self.watchdog_armed = True
+    
+    def feed_watchdog(self):
+        """Keep the current command alive without changing it"""
+        self.last_command_time = time.monotonic()
+    
+    def _set_drive_target(self, left_speed, right_speed):
+        """Set signed left/right target speeds in percent"""
+        if self.emergency_stop:
+            self.stop_all()
+            return
+        self.mixer.set_target(left_speed / self.MAX_SPEED, right_speed / self.MAX_SPEED)
+        self.setpoint_time = self.last_command_time = time.monotonic()
+        self.watchdog_armed = False
+    
+    def _control_loop(self):
+        """Fixed-rate control tick"""
+        period = 1.0 / self.CONTROL_RATE
+        next_tick = time.monotonic()
+        last_start = None
+        while self.control_running:
+            start = time.monotonic()
+            if last_start is not None:
+                self.period_jitter.observe(abs(start - last_start - period) * 1000)
+            last_start = start
+            
+            try:
+                # Use the nominal period so ramps do not depend on scheduling jitter
+                self.control_tick(period)
+            except Exception as e:
+                print(f"Control loop error: {e}")
+            
+            end = time.monotonic()
+            self.handler_latency.observe((end - start) * 1000)
+            self.control_ticks += 1
+            
+            next_tick += period
+            delay = next_tick - end
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.control_overruns += 1
+                next_tick = end
+    
+    def control_tick(self, dt):
+        """Advance the motor outputs toward the drive target by one tick"""
+        if self.emergency_stop:
+            return
+        
+        now = time.monotonic()
+        if self.setpoint_time is not None:
+            self.actuation_latency.observe((now - self.setpoint_time) * 1000)
+            self.setpoint_time = None
+        
+        # Watchdog: a stale command must not keep the robot driving
+        if (self.COMMAND_TIMEOUT and self.watchdog_armed
+                and now - self.last_command_time > self.COMMAND_TIMEOUT
+                and (self.mixer.target != (0.0, 0.0) or self.applied_output != (0.0, 0.0))):
+            self.watchdog_trips += 1
+            self.stop_all()
+            if self.telemetry is not None:
+                self.telemetry.record('watchdog', timeout=self.COMMAND_TIMEOUT)
+            return
+        
+        with self._command():
+            output = self.mixer.update(dt)
+            if output == self.applied_output:
+                return
+            self.applied_output = output
+            
+            left, right = output
+            self.set_motor_speed('left', abs(left) * self.MAX_SPEED, self._direction(left))
+            self.set_motor_speed('right', abs(right) * self.MAX_SPEED, self._direction(right))
+        
+        if self.telemetry is not None:
+            self.telemetry.record('motor', left=round(left, 3), right=round(right, 3),
+                                  tick_ms=round((time.monotonic() - now) * 1000, 3))
+    
+    def get_control_stats(self):
+        """Get control loop timing statistics (milliseconds)"""
+        return {
+            'rate_hz': self.CONTROL_RATE,
+            'ticks': self.control_ticks,
+            'overruns': self.control_overruns,
+            'period_jitter_ms': self.period_jitter.summary(),
+            'handler_ms': self.handler_latency.summary(),
+            'actuation_latency_ms': self.actuation_latency.summary(),
+            'watchdog_timeout_s': self.COMMAND_TIMEOUT,
+            'watchdog_trips': self.watchdog_trips
+        }
+    
+    @staticmethod
+    def _direction(value):
+        if value > 0:
+            return 1
+        elif value < 0:
+            return -1
+        return 0
     
     def emergency_stop_activate(self):
         """Activate emergency stop"""
@@ -250,27 +352,32 @@ class MotorControl:
             'right_speed': self.right_speed,
             'left_direction': self.left_direction,
             'right_direction': self.right_direction,
-            'emergency_stop': self.emergency_stop
+            'emergency_stop': self.emergency_stop,
+            'drive_target': self.mixer.target,
+            'control_loop': self.get_control_stats(),
+            'leds': self.leds.get_stats(),
+            'gpio': self.gpio.get_stats() if hasattr(self.gpio, 'get_stats') else {}
         }
     
     def cleanup(self):
         """Cleanup GPIO on shutdown"""
+        self.control_running = False
+        self.control_thread.join(timeout=1)
         self.stop_all()
-        self.pwm_a.stop()
-        self.pwm_b.stop()
-        GPIO.output(self.FRONT_LED_PIN, GPIO.LOW)
-        GPIO.output(self.BACK_LED_PIN, GPIO.LOW)
-        GPIO.cleanup()
+        self.leds.stop()
+        self.gpio.output(self.FRONT_LED_PIN, LOW)
+        self.gpio.output(self.BACK_LED_PIN, LOW)
+        self.drive.cleanup()
         print("Motor control cleaned up")
 
 # Global motor control instance
 motor_controller = None
 
-def init_motor_control():
+def init_motor_control(gpio_backend=None):
     """Initialize motor control"""
     global motor_controller
     try:
-        motor_controller = MotorControl()
+        motor_controller = MotorControl(gpio_backend)
         return True
     except Exception as e:
         print(f"Error initializing motor control: {e}")
@@ -4,8 +4,8 @@ Simple motor test script for Raspberry Pi robot
 Run this to test if your motor connections are working correctly
 """
 
-import RPi.GPIO as GPIO
 import time
+from drive_backend import DifferentialDrive, create_backend
 
 # Motor control pins
 ENA = 17  # Enable A
@@ -17,81 +17,41 @@ IN3 = 23  # Input 3
 IN4 = 24  # Input 4
 
 def setup():
-    """Setup GPIO pins"""
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setwarnings(False)
-    
-    # Setup motor pins
-    GPIO.setup(ENA, GPIO.OUT)
-    GPIO.setup(IN1, GPIO.OUT)
-    GPIO.setup(IN2, GPIO.OUT)
-    GPIO.setup(ENB, GPIO.OUT)
-    GPIO.setup(IN3, GPIO.OUT)
-    GPIO.setup(IN4, GPIO.OUT)
-    
-    # Initialize PWM for speed control
-    pwm_a = GPIO.PWM(ENA, 100)
-    pwm_b = GPIO.PWM(ENB, 100)
-    pwm_a.start(0)
-    pwm_b.start(0)
-    
-    return pwm_a, pwm_b
+    """Setup GPIO pins and PWM for speed control"""
+    # Set ROBOT_GPIO_BACKEND=simulated to dry-run without hardware
+    return DifferentialDrive(
+        create_backend(), pwm_freq=100,
+        left_pins=(ENA, IN1, IN2), right_pins=(ENB, IN3, IN4)
+    )
 
-def forward(pwm_a, pwm_b, speed=50):
+def forward(drive, speed=50):
     """Move forward"""
     print(f"Moving forward at {speed}% speed")
-    pwm_a.ChangeDutyCycle(speed)
-    pwm_b.ChangeDutyCycle(speed)
-    GPIO.output(IN1, GPIO.HIGH)
-    GPIO.output(IN2, GPIO.LOW)
-    GPIO.output(IN3, GPIO.HIGH)
-    GPIO.output(IN4, GPIO.LOW)
+    drive.forward(speed)
 
-def backward(pwm_a, pwm_b, speed=50):
+def backward(drive, speed=50):
     """Move backward"""
     print(f"Moving backward at {speed}% speed")
-    pwm_a.ChangeDutyCycle(speed)
-    pwm_b.ChangeDutyCycle(speed)
-    GPIO.output(IN1, GPIO.LOW)
-    GPIO.output(IN2, GPIO.HIGH)
-    GPIO.output(IN3, GPIO.LOW)
-    GPIO.output(IN4, GPIO.HIGH)
+    drive.backward(speed)
 
-def left(pwm_a, pwm_b, speed=50):
+def left(drive, speed=50):
     """Turn left"""
     print(f"Turning left at {speed}% speed")
-    pwm_a.ChangeDutyCycle(speed)
-    pwm_b.ChangeDutyCycle(speed)
-    GPIO.output(IN1, GPIO.LOW)
-    GPIO.output(IN2, GPIO.HIGH)
-    GPIO.output(IN3, GPIO.HIGH)
-    GPIO.output(IN4, GPIO.LOW)
+    drive.left(speed)
 
-def right(pwm_a, pwm_b, speed=50):
+def right(drive, speed=50):
     """Turn right"""
     print(f"Turning right at {speed}% speed")
-    pwm_a.ChangeDutyCycle(speed)
-    pwm_b.ChangeDutyCycle(speed)
-    GPIO.output(IN1, GPIO.HIGH)
-    GPIO.output(IN2, GPIO.LOW)
-    GPIO.output(IN3, GPIO.LOW)
-    GPIO.output(IN4, GPIO.HIGH)
+    drive.right(speed)
 
-def stop(pwm_a, pwm_b):
+def stop(drive):
     """Stop all motors"""
     print("Stopping all motors")
-    pwm_a.ChangeDutyCycle(0)
-    pwm_b.ChangeDutyCycle(0)
-    GPIO.output(IN1, GPIO.LOW)
-    GPIO.output(IN2, GPIO.LOW)
-    GPIO.output(IN3, GPIO.LOW)
-    GPIO.output(IN4, GPIO.LOW)
+    drive.stop()
 
-def cleanup(pwm_a, pwm_b):
+def cleanup(drive):
     """Cleanup GPIO"""
-    pwm_a.stop()
-    pwm_b.stop()
-    GPIO.cleanup()
+    drive.cleanup()
 
 def main():
     print("Raspberry Pi Robot Motor Test")
@@ -101,34 +61,34 @@ def main():
     print()
     
     try:
-        pwm_a, pwm_b = setup()
+        drive = setup()
         
         print("Starting motor test sequence...")
         print("Press Ctrl+C to stop")
         
         while True:
             # Test forward
-            forward(pwm_a, pwm_b, 30)
+            forward(drive, 30)
             time.sleep(2)
-            stop(pwm_a, pwm_b)
+            stop(drive)
             time.sleep(1)
             
             # Test backward
-            backward(pwm_a, pwm_b, 30)
+            backward(drive, 30)
             time.sleep(2)
-            stop(pwm_a, pwm_b)
+            stop(drive)
             time.sleep(1)
             
             # Test left turn
-            left(pwm_a, pwm_b, 30)
+            left(drive, 30)
             time.sleep(2)
-            stop(pwm_a, pwm_b)
+            stop(drive)
             time.sleep(1)
             
             # Test right turn
-            right(pwm_a, pwm_b, 30)
+            right(drive, 30)
             time.sleep(2)
-            stop(pwm_a, pwm_b)
+            stop(drive)
             time.sleep(1)
             
     except KeyboardInterrupt:
@@ -136,7 +96,7 @@ def main():
     except Exception as e:
         print(f"Error: {e}")
     finally:
-        cleanup(pwm_a, pwm_b)
+        cleanup(drive)
         print("Motor test completed")
 
 if __name__ == "__main__":
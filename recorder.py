@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+
+class Recorder:
+    """Record a frame broadcaster to disk as rotating MJPEG segments.
+
+    Frames are written by the recorder's own thread, which reads from the
+    broadcaster like any stream client; if the disk is slow, frames are
+    skipped rather than holding up capture. Each finished segment is
+    listed in index.jsonl, and the oldest segments are deleted once the
+    recordings take more than max_total_bytes.
+    """
+
+    def __init__(self, broadcaster, directory='recordings', segment_seconds=60,
+                 max_total_bytes=500 * 1024 * 1024):
+        self.broadcaster = broadcaster
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.max_total_bytes = max_total_bytes
+        self.index_path = os.path.join(directory, 'index.jsonl')
+
+        # Finished segments, oldest first: {'file', 'start', 'end', 'frames', 'bytes'}
+        self.segments = self._load_index()
+        self.lock = threading.Lock()
+
+        # Segment currently being written (owned by the recording thread; kept here for status)
+        self.segment = None
+
+        # Recorder statistics
+        self.frames_written = 0
+        self.frames_skipped = 0
+        self.segments_deleted = 0
+
+        self.is_recording = False
+        self.thread = None
+
+    def _load_index(self):
+        """Read the segments recorded by earlier runs"""
+        segments = []
+        try:
+            with open(self.index_path) as f:
+                for line in f:
+                    segment = json.loads(line)
+                    if os.path.exists(os.path.join(self.directory, segment['file'])):
+                        segments.append(segment)
+        except (OSError, ValueError):
+            pass
+        return segments
+
+    def start(self):
+        """Start recording; returns False if already recording or the last recording is still stopping"""
+        with self.lock:
+            if self.is_recording:
+                return False
+            if self.thread is not None and self.thread.is_alive():
+                # The last recording thread is still finishing its segment
+                print("Recording not started: previous recording is still stopping")
+                return False
+            os.makedirs(self.directory, exist_ok=True)
+            self.is_recording = True
+            # Subscribing keeps the camera pipeline encoding while nobody is watching
+            self.broadcaster.subscribe()
+            self.thread = threading.Thread(target=self._record_loop, name='recorder', daemon=True)
+            self.thread.start()
+        print(f"Recording to {self.directory}")
+        return True
+
+    def stop(self):
+        """Stop recording and finish the current segment; returns False if not recording"""
+        with self.lock:
+            if not self.is_recording:
+                return False
+            self.is_recording = False
+            thread = self.thread
+        thread.join(timeout=2)
+        self.broadcaster.unsubscribe()
+        if thread.is_alive():
+            print("Recording stopped, still finishing the last segment")
+        else:
+            print("Recording stopped")
+        return True
+
+    def _record_loop(self):
+        """Write every new frame to the current segment"""
+        last_sequence, _ = self.broadcaster.get_frame()
+        # Open file and segment belong to this loop only
+        file = segment = None
+        try:
+            while self.is_recording and self.broadcaster.is_running:
+                sequence, frame = self.broadcaster.wait_for_frame(last_sequence, timeout=0.5)
+                if sequence == last_sequence or frame is None:
+                    continue
+                if last_sequence:
+                    self.frames_skipped += sequence - last_sequence - 1
+                last_sequence = sequence
+
+                now = time.time()
+                if file is not None and now - segment['start'] >= self.segment_seconds:
+                    self._finish_segment(file, segment)
+                    file = segment = None
+                if file is None:
+                    file, segment = self._open_segment(now)
+                file.write(frame)
+                segment['frames'] += 1
+                segment['bytes'] += len(frame)
+                segment['end'] = now
+                self.frames_written += 1
+        except OSError as e:
+            print(f"Recording error: {e}")
+            with self.lock:
+                if self.is_recording:
+                    self.is_recording = False
+                    self.broadcaster.unsubscribe()
+        finally:
+            if file is not None:
+                self._finish_segment(file, segment)
+
+    def _open_segment(self, now):
+        name = time.strftime('segment-%Y%m%d-%H%M%S', time.localtime(now)) + f'.{int(now * 1000) % 1000:03d}.mjpeg'
+        file = open(os.path.join(self.directory, name), 'wb')
+        segment = self.segment = {'file': name, 'start': now, 'end': now, 'frames': 0, 'bytes': 0}
+        return file, segment
+
+    def _finish_segment(self, file, segment):
+        """Close a segment, add it to the index and apply retention"""
+        if self.segment is segment:
+            self.segment = None
+        try:
+            file.close()
+        except OSError as e:
+            # Buffered frames may be lost, but the segment is still listed for what reached the disk
+            print(f"Recording error closing {segment['file']}: {e}")
+        segment['start'] = round(segment['start'], 3)
+        segment['end'] = round(segment['end'], 3)
+        try:
+            with self.lock:
+                self.segments.append(segment)
+                deleted = self._apply_retention()
+            if deleted:
+                self._write_index()
+            else:
+                with open(self.index_path, 'a') as f:
+                    f.write(json.dumps(segment) + '\n')
+        except OSError as e:
+            print(f"Recording index error: {e}")
+
+    def _apply_retention(self):
+        """Delete the oldest segments until the total size is within the limit"""
+        deleted = 0
+        while len(self.segments) > 1 and self._total_bytes() > self.max_total_bytes:
+            segment = self.segments.pop(0)
+            try:
+                os.remove(os.path.join(self.directory, segment['file']))
+            except FileNotFoundError:
+                pass
+            deleted += 1
+        self.segments_deleted += deleted
+        return deleted
+
+    def _total_bytes(self):
+        return sum(segment['bytes'] for segment in self.segments)
+
+    def _write_index(self):
+        # Rewrite through a temporary file so a crash never leaves a partial index
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            for segment in self.segments:
+                f.write(json.dumps(segment) + '\n')
+        os.replace(temp_path, self.index_path)
+
+    def get_status(self):
+        """Get recording state and statistics"""
+        with self.lock:
+            segments = list(self.segments)
+        current = self.segment
+        return {
+            'recording': self.is_recording,
+            'directory': self.directory,
+            'current_segment': current['file'] if current else None,
+            'segments': [segment['file'] for segment in segments],
+            'total_bytes': sum(segment['bytes'] for segment in segments) + (current['bytes'] if current else 0),
+            'frames_written': self.frames_written,
+            'frames_skipped': self.frames_skipped,
+            'segments_deleted': self.segments_deleted
+        }
@@ -1,256 +1,612 @@
-import RPi.GPIO as GPIO
-from picamera2 import Picamera2
-from picamera2.encoders import JpegEncoder
-from picamera2.outputs import FileOutput
+import math
+import os
 import threading
 import time
 import json
 from flask import Flask, render_template, jsonify, request, Response
-import io
-import cv2
+from camera_stream import FrameBroadcaster, CameraPipeline, StreamProfile, create_camera
+from command_queue import ActuationThread
+from motor_control import MotorControl
+from telemetry import Telemetry
+from recorder import Recorder
+from snapshot import SnapshotCache
+from vision import VisionWorker
+from metrics import RequestMetrics, metric, format_prometheus, format_json
+from server import serve
+from control_channel import ControlChannel
+
+# WebSocket control channel is optional
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+# Camera settings, selectable at startup through the environment
+CAMERA_BACKEND = os.environ.get('ROBOT_CAMERA_BACKEND', 'picamera2')  # picamera2 or fake
+CAMERA_MODE = os.environ.get('ROBOT_CAMERA_MODE', 'hardware')  # hardware or software
+CAMERA_QUALITY = int(os.environ.get('ROBOT_CAMERA_QUALITY', '85'))
+CAMERA_FPS = int(os.environ.get('ROBOT_CAMERA_FPS', '30'))
+
+# Low-bandwidth stream profile (/video_feed?profile=low), from the same capture
+LOW_PROFILE_SIZE = (320, 240)
+LOW_PROFILE_QUALITY = int(os.environ.get('ROBOT_CAMERA_LOW_QUALITY', '50'))
+LOW_PROFILE_FPS = int(os.environ.get('ROBOT_CAMERA_LOW_FPS', '10'))
+
+# On-robot recording: MJPEG segments of this many seconds, oldest deleted past the size limit
+RECORDING_DIR = os.environ.get('ROBOT_RECORDING_DIR', 'recordings')
+RECORDING_SEGMENT_SECONDS = int(os.environ.get('ROBOT_RECORDING_SEGMENT_SECONDS', '60'))
+RECORDING_MAX_MB = int(os.environ.get('ROBOT_RECORDING_MAX_MB', '500'))
+
+# Motor control tick rate (Hz)
+CONTROL_RATE = int(os.environ.get('ROBOT_CONTROL_RATE', '100'))
+
+# Stop the motors if no command arrives for this many seconds (0 disables)
+COMMAND_TIMEOUT = float(os.environ.get('ROBOT_COMMAND_TIMEOUT', '1.0'))
+
+# Web server: 'pooled' isolates streams from control requests, 'dev' is Flask's development server
+SERVER_MODE = os.environ.get('ROBOT_SERVER_MODE', 'pooled')
+SERVER_CONTROL_WORKERS = int(os.environ.get('ROBOT_SERVER_CONTROL_WORKERS', '8'))
+SERVER_STREAM_WORKERS = int(os.environ.get('ROBOT_SERVER_STREAM_WORKERS', '4'))
+
+# Structured telemetry log (empty to keep events in memory only)
+TELEMETRY_FILE = os.environ.get('ROBOT_TELEMETRY_FILE', 'telemetry.jsonl')
+TELEMETRY_LIMITS = {
+    'joystick': {'sample': 1, 'max_rate': 20},
+    'motor': {'sample': 1, 'max_rate': 50}
+}
+
+# Startup times are measured from here
+IMPORT_TIME = time.monotonic()
+BOOT_ID = format(int(time.time()), 'x')
+
+# Operation modes; AUTONOMOUS drives from the vision stage
+MODES = ('MANUAL', 'AUTONOMOUS')
+
+class LazyComponent:
+    """Hardware component built once, on first use or in the background.
+    
+    A factory that fails is not retried on every access: the error is
+    kept, get() raises straight away until the backoff has passed, and
+    the backoff doubles with each failure up to max_backoff seconds.
+    """
+    
+    def __init__(self, name, factory, backoff=5.0, max_backoff=60.0):
+        self.name = name
+        self.factory = factory
+        self.value = None
+        self.lock = threading.Lock()
+        self.building = False
+        
+        # Last failure: the exception, when it happened (monotonic) and the wait before retrying
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.error = None
+        self.failed_at = None
+        self.retry_delay = backoff
+        self.failures = 0
+        
+        # Seconds spent in the factory, and when it finished (relative to IMPORT_TIME)
+        self.init_seconds = None
+        self.ready_at = None
+    
+    def get(self):
+        """Get the component, building it (or waiting for it) if needed"""
+        if self.value is None:
+            with self.lock:
+                if self.value is None:
+                    self._build()
+        return self.value
+    
+    def _build(self):
+        if self.error is not None and time.monotonic() < self.failed_at + self.retry_delay:
+            raise RuntimeError(f"{self.name} unavailable: {self.error}") from self.error
+        self.building = True
+        start = time.monotonic()
+        try:
+            self.value = self.factory()
+        except Exception as e:
+            if self.error is not None:
+                self.retry_delay = min(self.retry_delay * 2, self.max_backoff)
+            self.error = e
+            self.failed_at = time.monotonic()
+            self.failures += 1
+            print(f"{self.name} failed to start ({e}), retrying in {self.retry_delay:.0f} s")
+            raise
+        finally:
+            self.building = False
+        self.error = None
+        self.init_seconds = time.monotonic() - start
+        self.ready_at = time.monotonic() - IMPORT_TIME
+    
+    @property
+    def is_ready(self):
+        return self.value is not None
+    
+    def get_state(self):
+        """Describe the component without building it"""
+        if self.value is not None:
+            return {'state': 'ready'}
+        if self.building:
+            return {'state': 'starting'}
+        if self.error is not None:
+            return {
+                'state': 'failed',
+                'error': str(self.error),
+                'failures': self.failures,
+                'retry_in_s': round(max(0.0, self.failed_at + self.retry_delay - time.monotonic()), 1)
+            }
+        return {'state': 'not started'}
+    
+    def start(self):
+        """Build the component on a background thread"""
+        thread = threading.Thread(target=self._start, name=f'init-{self.name}', daemon=True)
+        thread.start()
+        return thread
+    
+    def _start(self):
+        try:
+            self.get()
+        except Exception:
+            pass    # kept in self.error and reported by get_state()
+
 
 class RobotController:
-    def __init__(self):
-        # Motor control pins
-        self.ENA = 17
-        self.IN1 = 27
-        self.IN2 = 22
+    def __init__(self, camera_backend=CAMERA_BACKEND, camera_mode=CAMERA_MODE, gpio_backend=None):
+        self.camera_backend = camera_backend
+        self.camera_mode = camera_mode
+        self.gpio_backend = gpio_backend
         
-        # Additional motor pins for dual motor control
-        self.ENB = 18
-        self.IN3 = 23
-        self.IN4 = 24
+        # Hot paths record telemetry events instead of printing
+        self.telemetry = Telemetry(TELEMETRY_FILE, limits=TELEMETRY_LIMITS)
         
-        # Initialize GPIO
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setwarnings(False)
+        # Encoded frames are published once and shared by all stream clients
+        self.frame_broadcaster = FrameBroadcaster(max_fps=CAMERA_FPS)
         
-        # Setup motor pins
-        GPIO.setup(self.ENA, GPIO.OUT)
-        GPIO.setup(self.IN1, GPIO.OUT)
-        GPIO.setup(self.IN2, GPIO.OUT)
-        GPIO.setup(self.ENB, GPIO.OUT)
-        GPIO.setup(self.IN3, GPIO.OUT)
-        GPIO.setup(self.IN4, GPIO.OUT)
+        # Stream profiles by name; 'high' is the full-size main stream
+        self.low_profile = StreamProfile('low', LOW_PROFILE_SIZE, LOW_PROFILE_QUALITY, LOW_PROFILE_FPS)
+        self.stream_broadcasters = {
+            'high': self.frame_broadcaster,
+            'low': self.low_profile.broadcaster
+        }
         
-        # Initialize PWM for speed control
-        self.pwm_a = GPIO.PWM(self.ENA, 100)
-        self.pwm_b = GPIO.PWM(self.ENB, 100)
-        self.pwm_a.start(0)
-        self.pwm_b.start(0)
+        # Still images for dashboards that poll instead of streaming
+        self.snapshots = SnapshotCache(self.frame_broadcaster)
         
-        # Initialize camera
-        self.picam2 = Picamera2()
-        self.camera_config = self.picam2.create_preview_configuration(
-            main={"size": (640, 480)},
-            buffer_count=4
+        # Incident recording of the main stream, started and stopped through the API
+        self.recorder = Recorder(
+            self.frame_broadcaster, RECORDING_DIR,
+            segment_seconds=RECORDING_SEGMENT_SECONDS,
+            max_total_bytes=RECORDING_MAX_MB * 1024 * 1024
         )
-        self.picam2.configure(self.camera_config)
-        self.picam2.start()
         
-        # Robot state
+        # Line following and obstacle detection on the low profile, in its own process
+        self.vision = VisionWorker(self.low_profile.broadcaster, self._submit_vision_setpoint)
+        
+        # Robot state; mode changes are serialized so only one vision worker is ever started
         self.current_mode = "MANUAL"
+        self.mode_lock = threading.Lock()
         self.is_running = True
         
-        # Start camera thread
-        self.camera_thread = threading.Thread(target=self._camera_loop, daemon=True)
-        self.camera_thread.start()
+        # Motor commands from the web API are applied on a dedicated thread
+        self.actuator = ActuationThread()
+        
+        # GPIO and camera are only touched on first use or by start_hardware()
+        self._motors = LazyComponent('motors', self._create_motors)
+        self._camera = LazyComponent('camera', self._create_camera)
+    
+    def _create_motors(self):
+        # Motors are driven through MotorControl's mixer and control tick
+        return MotorControl(
+            self.gpio_backend, pwm_freq=100,
+            control_rate=CONTROL_RATE, command_timeout=COMMAND_TIMEOUT,
+            telemetry=self.telemetry
+        )
+    
+    def _create_camera(self):
+        # Initialize camera and start publishing frames
+        camera = create_camera(self.camera_backend, size=(640, 480), fps=CAMERA_FPS,
+                               lores_size=self.low_profile.size)
+        pipeline = CameraPipeline(
+            camera, self.frame_broadcaster,
+            mode=self.camera_mode, quality=CAMERA_QUALITY, fps=CAMERA_FPS,
+            profiles=[self.low_profile]
+        )
+        pipeline.start()
+        return pipeline
+    
+    @property
+    def motors(self):
+        return self._motors.get()
+    
+    @property
+    def camera_pipeline(self):
+        return self._camera.get()
+    
+    def start_hardware(self, wait=True):
+        """Initialize GPIO and camera in parallel, then print a startup report"""
+        threads = [self._motors.start(), self._camera.start()]
+        
+        def report():
+            for thread in threads:
+                thread.join()
+            report = self.get_startup_report()
+            def took(component, seconds):
+                return f"{seconds} s" if component.is_ready else component.get_state()['state']
+            print(f"Startup: drivable after {took(self._motors, report['drivable_s'])}, "
+                  f"motors {took(self._motors, report['motors_s'])}, "
+                  f"camera {took(self._camera, report['camera_s'])}")
+            self.telemetry.record('startup', **report)
+        
+        if wait:
+            report()
+        else:
+            threading.Thread(target=report, name='startup-report', daemon=True).start()
+    
+    def get_startup_report(self):
+        """Get hardware initialization times in seconds"""
+        def seconds(value):
+            return round(value, 3) if value is not None else None
+        return {
+            'motors_s': seconds(self._motors.init_seconds),
+            'camera_s': seconds(self._camera.init_seconds),
+            'drivable_s': seconds(self._motors.ready_at),
+            'streaming_s': seconds(self._camera.ready_at)
+        }
     
     def forward(self, speed=100):
         """Move robot forward"""
-        self.pwm_a.ChangeDutyCycle(speed)
-        self.pwm_b.ChangeDutyCycle(speed)
-        GPIO.output(self.IN1, GPIO.HIGH)
-        GPIO.output(self.IN2, GPIO.LOW)
-        GPIO.output(self.IN3, GPIO.HIGH)
-        GPIO.output(self.IN4, GPIO.LOW)
-        print(f"Moving forward at {speed}% speed")
+        self.motors.move_forward(speed)
+        self.telemetry.record('command', action='forward', speed=speed)
     
     def backward(self, speed=100):
         """Move robot backward"""
-        self.pwm_a.ChangeDutyCycle(speed)
-        self.pwm_b.ChangeDutyCycle(speed)
-        GPIO.output(self.IN1, GPIO.LOW)
-        GPIO.output(self.IN2, GPIO.HIGH)
-        GPIO.output(self.IN3, GPIO.LOW)
-        GPIO.output(self.IN4, GPIO.HIGH)
-        print(f"Moving backward at {speed}% speed")
+        self.motors.move_backward(speed)
+        self.telemetry.record('command', action='backward', speed=speed)
     
     def left(self, speed=100):
         """Turn robot left"""
-        self.pwm_a.ChangeDutyCycle(speed)
-        self.pwm_b.ChangeDutyCycle(speed)
-        GPIO.output(self.IN1, GPIO.LOW)
-        GPIO.output(self.IN2, GPIO.HIGH)
-        GPIO.output(self.IN3, GPIO.HIGH)
-        GPIO.output(self.IN4, GPIO.LOW)
-        print(f"Turning left at {speed}% speed")
+        self.motors.turn_left(speed)
+        self.telemetry.record('command', action='left', speed=speed)
     
     def right(self, speed=100):
         """Turn robot right"""
-        self.pwm_a.ChangeDutyCycle(speed)
-        self.pwm_b.ChangeDutyCycle(speed)
-        GPIO.output(self.IN1, GPIO.HIGH)
-        GPIO.output(self.IN2, GPIO.LOW)
-        GPIO.output(self.IN3, GPIO.LOW)
-        GPIO.output(self.IN4, GPIO.HIGH)
-        print(f"Turning right at {speed}% speed")
+        self.motors.turn_right(speed)
+        self.telemetry.record('command', action='right', speed=speed)
     
     def stop(self):
         """Stop robot movement"""
-        self.pwm_a.ChangeDutyCycle(0)
-        self.pwm_b.ChangeDutyCycle(0)
-        GPIO.output(self.IN1, GPIO.LOW)
-        GPIO.output(self.IN2, GPIO.LOW)
-        GPIO.output(self.IN3, GPIO.LOW)
-        GPIO.output(self.IN4, GPIO.LOW)
-        print("Robot stopped")
+        self.motors.stop_all()
+        self.telemetry.record('command', action='stop')
     
     def joystick_control(self, x, y, magnitude):
         """Control robot using joystick input"""
-        if magnitude < 0.1:  # Dead zone
-            self.stop()
-            return
-        
-        # Calculate speed based on magnitude
-        speed = int(magnitude * 100)
-        speed = max(20, min(100, speed))  # Clamp between 20-100%
-        
-        # Calculate direction based on angle
-        if abs(x) > abs(y):
-            if x > 0:
-                self.right(speed)
-            else:
-                self.left(speed)
-        else:
-            if y > 0:
-                self.forward(speed)
-            else:
-                self.backward(speed)
-    
-    def _camera_loop(self):
-        """Camera streaming loop"""
-        while self.is_running:
-            try:
-                # Capture frame
-                frame = self.picam2.capture_array()
-                # Convert to JPEG
-                _, buffer = cv2.imencode('.jpg', frame)
-                frame_bytes = buffer.tobytes()
-                
-                # Store latest frame for streaming
-                self.latest_frame = frame_bytes
-                time.sleep(0.033)  # ~30 FPS
-            except Exception as e:
-                print(f"Camera error: {e}")
-                time.sleep(1)
+        if not all(math.isfinite(value) for value in (x, y, magnitude)):
+            # A broken stick reading must never turn into full speed
+            x = y = magnitude = 0.0
+        # Scale the stick direction by its magnitude, then mix into left/right speeds
+        length = math.hypot(x, y)
+        if length > 0:
+            scale = min(1.0, magnitude) / length
+            x, y = x * scale, y * scale
+        self.motors.set_drive(y, x)
+    
+    def submit_action(self, action):
+        """Queue a movement action; returns False for an unknown action"""
+        actions = {
+            'forward': self.forward,
+            'backward': self.backward,
+            'left': self.left,
+            'right': self.right,
+            'stop': self.stop
+        }
+        if action not in actions:
+            return False
+        self.actuator.submit(actions[action])
+        return True
+    
+    def submit_joystick(self, x, y, magnitude):
+        """Queue joystick input; only the latest position reaches the motors"""
+        self.telemetry.record('joystick', x=x, y=y, magnitude=magnitude)
+        if self.current_mode == "MANUAL":
+            self.actuator.submit(self.joystick_control, x, y, magnitude)
     
     def get_camera_frame(self):
         """Get the latest camera frame"""
-        if hasattr(self, 'latest_frame'):
-            return self.latest_frame
-        return None
+        _, frame = self.frame_broadcaster.get_frame()
+        return bytes(frame) if frame is not None else None
+    
+    def start_recording(self):
+        """Start recording the camera; returns False if already recording"""
+        # Make sure frames are being published
+        self.camera_pipeline
+        started = self.recorder.start()
+        if started:
+            self.telemetry.record('recording', action='start')
+        return started
+    
+    def stop_recording(self):
+        """Stop recording; returns False if not recording"""
+        stopped = self.recorder.stop()
+        if stopped:
+            self.telemetry.record('recording', action='stop')
+        return stopped
+    
+    def _submit_vision_setpoint(self, throttle, turn):
+        if self.current_mode == "AUTONOMOUS":
+            self.actuator.submit(self.motors.set_drive, throttle, turn)
     
     def set_mode(self, mode):
-        """Set robot operation mode"""
-        self.current_mode = mode
-        print(f"Robot mode changed to: {mode}")
+        """Set robot operation mode; returns False for an unknown mode"""
+        mode = str(mode).upper()
+        if mode not in MODES:
+            return False
+        with self.mode_lock:
+            if mode == self.current_mode:
+                return True
+            
+            if mode == "AUTONOMOUS":
+                # Make sure frames are being published before vision subscribes
+                self.camera_pipeline
+                self.current_mode = mode
+                self.vision.start()
+            else:
+                self.current_mode = mode
+                self.vision.stop()
+                self.actuator.submit(self.stop)
+        self.telemetry.record('mode', mode=mode)
+        return True
+    
+    def get_status(self):
+        """Get robot status"""
+        return {
+            'battery': '85%',
+            'location': 'Home',
+            'mode': self.current_mode,
+            # Report components that are not up instead of building them here
+            'camera': self.camera_pipeline.get_stats() if self._camera.is_ready else self._camera.get_state(),
+            'commands': self.actuator.get_stats(),
+            'motors': self.motors.get_status() if self._motors.is_ready else self._motors.get_state(),
+            'telemetry': self.telemetry.get_stats(),
+            'startup': self.get_startup_report(),
+            'recording': self.recorder.get_status(),
+            'snapshots': self.snapshots.get_stats(),
+            'vision': self.vision.get_stats(),
+            'status': 'connected'
+        }
+    
+    def collect_metrics(self):
+        """Get camera, stream, command, control loop and GPIO metric families.
+        
+        Camera and motor families are left out until that hardware is up.
+        """
+        commands = self.actuator.get_stats()
+        clients = [(profile, client_id, stats)
+                   for profile, broadcaster in self.stream_broadcasters.items()
+                   for client_id, stats in broadcaster.get_client_stats().items()]
+        families = []
+        if self._camera.is_ready:
+            camera = self.camera_pipeline.get_stats()
+            families += [
+                metric('robot_camera_capture_duration_seconds', 'histogram', 'Software capture time per frame',
+                       [({}, self.camera_pipeline.capture_time)]),
+                metric('robot_camera_encode_duration_seconds', 'histogram', 'Software JPEG encode time per frame',
+                       [({}, self.camera_pipeline.encode_time)]),
+                metric('robot_camera_frames_published_total', 'counter', 'Frames published to the stream',
+                       [({}, camera['frames_published'])]),
+                metric('robot_camera_quality_level', 'gauge', 'Adaptive quality level (0 is full quality)',
+                       [({}, camera['quality_level'])])
+            ]
+        families += [
+            metric('robot_stream_clients', 'gauge', 'Connected video stream clients',
+                   [({'profile': profile}, broadcaster.get_subscriber_count())
+                    for profile, broadcaster in self.stream_broadcasters.items()]),
+            metric('robot_stream_client_fps', 'gauge', 'Delivered frame rate per stream client',
+                   [({'profile': profile, 'client': str(client_id)}, stats['fps'])
+                    for profile, client_id, stats in clients]),
+            metric('robot_stream_frames_sent_total', 'counter', 'Frames sent to all stream clients',
+                   [({'profile': profile}, broadcaster.frames_sent)
+                    for profile, broadcaster in self.stream_broadcasters.items()]),
+            metric('robot_stream_bytes_sent_total', 'counter', 'Bytes sent to all stream clients',
+                   [({'profile': profile}, broadcaster.bytes_sent)
+                    for profile, broadcaster in self.stream_broadcasters.items()]),
+            metric('robot_motor_commands_total', 'counter', 'Motor commands by outcome',
+                   [({'outcome': 'posted'}, commands['posted']),
+                    ({'outcome': 'executed'}, commands['executed']),
+                    ({'outcome': 'coalesced'}, commands['coalesced'])]),
+            metric('robot_motor_command_rate', 'gauge', 'Motor commands per second (10 s window)',
+                   [({}, commands['rate_hz'])])
+        ]
+        if self._motors.is_ready:
+            gpio = self.motors.get_status()['gpio']
+            families += [
+                metric('robot_control_loop_period_jitter_seconds', 'histogram', 'Control tick period jitter',
+                       [({}, self.motors.period_jitter)]),
+                metric('robot_control_loop_handler_seconds', 'histogram', 'Time spent in the control tick',
+                       [({}, self.motors.handler_latency)]),
+                metric('robot_control_loop_overruns_total', 'counter', 'Control ticks that missed their deadline',
+                       [({}, self.motors.control_overruns)]),
+                metric('robot_gpio_writes_total', 'counter', 'GPIO and PWM writes by outcome',
+                       [({'outcome': 'issued'}, gpio.get('writes_issued', 0)),
+                        ({'outcome': 'elided'}, gpio.get('writes_elided', 0))])
+            ]
+        return families
     
     def cleanup(self):
         """Cleanup GPIO and camera"""
         self.is_running = False
-        self.stop()
-        self.pwm_a.stop()
-        self.pwm_b.stop()
-        GPIO.cleanup()
-        self.picam2.close()
+        self.vision.stop()
+        self.recorder.stop()
+        self.snapshots.close()
+        for broadcaster in self.stream_broadcasters.values():
+            broadcaster.close()
+        self.actuator.stop()
+        # Only clean up hardware that was actually initialized
+        if self._motors.is_ready:
+            self.motors.cleanup()
+        self.telemetry.close()
+        if self._camera.is_ready:
+            self.camera_pipeline.stop()
 
-# Initialize robot controller
-robot = RobotController()
+def create_app(robot=None):
+    """Create the Flask app for robot (a default RobotController when None).
 
-# Flask app setup
-app = Flask(__name__)
+    Hardware is not touched here; call robot.start_hardware() to bring it
+    up in the background, otherwise it is initialized on first use.
+    """
+    if robot is None:
+        robot = RobotController()
+    
+    app = Flask(__name__)
+    app.extensions['robot'] = robot
+    
+    # Per-route request counts and latency
+    request_metrics = RequestMetrics()
+    request_metrics.install(app)
+    app.extensions['request_metrics'] = request_metrics
+    
+    register_routes(app, robot, request_metrics)
+    return app
 
-def gen_frames():
+def gen_frames(robot, max_fps=None, profile='high'):
     """Generate camera frames for streaming"""
-    while True:
-        frame = robot.get_camera_frame()
-        if frame:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-        else:
-            time.sleep(0.1)
+    # Make sure frames are being published before the client starts waiting
+    robot.camera_pipeline
+    return robot.stream_broadcasters[profile].stream(max_fps)
+
+def register_routes(app, robot, request_metrics):
+    """Attach the web interface and API routes to app"""
+    
+    @app.route('/')
+    def index():
+        return render_template('index.html')
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+    @app.route('/video_feed')
+    def video_feed():
+        max_fps = request.args.get('fps', type=float)
+        profile = request.args.get('profile', 'high')
+        if profile not in robot.stream_broadcasters:
+            return jsonify({'status': 'error', 'message': 'Unknown profile',
+                            'profiles': list(robot.stream_broadcasters)}), 404
+        return Response(gen_frames(robot, max_fps, profile), mimetype='multipart/x-mixed-replace; boundary=frame')
 
-@app.route('/video_feed')
-def video_feed():
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    @app.route('/api/control', methods=['POST'])
+    def control():
+        data = request.get_json() or {}
+        action = data.get('action')
+    
+        if not robot.submit_action(action):
+            return jsonify({'status': 'error', 'message': 'Invalid action'})
+    
+        return jsonify({'status': 'success', 'action': action})
+
+    @app.route('/api/joystick', methods=['POST'])
+    def joystick():
+        data = request.get_json() or {}
+        side = data.get('side')
+        x = data.get('x', 0)
+        y = data.get('y', 0)
+        magnitude = data.get('magnitude', 0)
+        angle = data.get('angle', 0)
+        
+        # Validate here, not on the actuation thread, so the client sees the error
+        try:
+            x, y, magnitude = float(x), float(y), float(magnitude)
+            if not all(math.isfinite(value) for value in (x, y, magnitude)):
+                raise ValueError("non-finite joystick value")
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'Invalid joystick values'})
+    
+        robot.submit_joystick(x, y, magnitude)
+    
+        return jsonify({'status': 'success', 'side': side, 'x': x, 'y': y, 'magnitude': magnitude, 'angle': angle})
+
+    @app.route('/api/mode', methods=['POST'])
+    def mode():
+        data = request.get_json() or {}
+        mode = data.get('mode')
+    
+        if not robot.set_mode(mode):
+            return jsonify({'status': 'error', 'message': 'Invalid mode', 'modes': list(MODES)})
+        return jsonify({'status': 'success', 'mode': robot.current_mode})
+
+    @app.route('/api/snapshot')
+    def snapshot():
+        width = request.args.get('width', type=int)
+        # Make sure frames are being published
+        robot.camera_pipeline
+        latest = robot.snapshots.get()
+        if latest is None:
+            return jsonify({'status': 'error', 'message': 'No camera frame available'}), 503
+        sequence, published, jpeg = latest
+        
+        # The frame sequence identifies the image; the boot id keeps tags unique across restarts.
+        # Only the ETag decides 304: Last-Modified has one-second resolution, so a newer frame
+        # from the same second would look unmodified to If-Modified-Since.
+        etag = f'{BOOT_ID}-{sequence}-{width or "full"}'
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            if width and width > 0:
+                data = robot.snapshots.get_thumbnail(sequence, jpeg, min(width, 1920))
+            else:
+                data = bytes(jpeg)
+            response = Response(data, mimetype='image/jpeg')
+        response.set_etag(etag)
+        response.last_modified = published
+        response.cache_control.no_cache = True
+        return response
 
-@app.route('/api/control', methods=['POST'])
-def control():
-    data = request.get_json() or {}
-    action = data.get('action')
-    
-    if action == 'forward':
-        robot.forward()
-    elif action == 'backward':
-        robot.backward()
-    elif action == 'left':
-        robot.left()
-    elif action == 'right':
-        robot.right()
-    elif action == 'stop':
-        robot.stop()
-    else:
-        return jsonify({'status': 'error', 'message': 'Invalid action'})
-    
-    print(f"Action received: {action}")
-    return jsonify({'status': 'success', 'action': action})
+    @app.route('/api/recording', methods=['GET', 'POST'])
+    def recording():
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            action = data.get('action')
+            if action == 'start':
+                robot.start_recording()
+            elif action == 'stop':
+                robot.stop_recording()
+            else:
+                return jsonify({'status': 'error', 'message': 'Invalid action'})
+        return jsonify(robot.recorder.get_status())
 
-@app.route('/api/joystick', methods=['POST'])
-def joystick():
-    data = request.get_json() or {}
-    side = data.get('side')
-    x = data.get('x', 0)
-    y = data.get('y', 0)
-    magnitude = data.get('magnitude', 0)
-    angle = data.get('angle', 0)
-    
-    if robot.current_mode == "MANUAL":
-        robot.joystick_control(x, y, magnitude)
-    
-    print(f"Joystick {side}: x={x:.2f}, y={y:.2f}, magnitude={magnitude:.2f}, angle={angle:.2f}")
-    return jsonify({'status': 'success', 'side': side, 'x': x, 'y': y, 'magnitude': magnitude, 'angle': angle})
+    @app.route('/api/status')
+    def status():
+        return jsonify(robot.get_status())
 
-@app.route('/api/mode', methods=['POST'])
-def mode():
-    data = request.get_json() or {}
-    mode = data.get('mode')
-    
-    robot.set_mode(mode)
-    print(f"Mode changed to: {mode}")
-    return jsonify({'status': 'success', 'mode': mode})
+    @app.route('/metrics')
+    def metrics():
+        families = request_metrics.collect() + robot.collect_metrics()
+        return Response(format_prometheus(families), mimetype='text/plain; version=0.0.4')
 
-@app.route('/api/status')
-def status():
-    return jsonify({
-        'battery': '85%',
-        'location': 'Home',
-        'mode': robot.current_mode,
-        'status': 'connected'
-    })
+    @app.route('/api/metrics')
+    def metrics_json():
+        families = request_metrics.collect() + robot.collect_metrics()
+        return jsonify(format_json(families))
+
+    if Sock is not None:
+        sock = Sock(app)
+    
+        @sock.route('/ws/control')
+        def control_socket(ws):
+            ControlChannel(robot).serve(ws)
 
 if __name__ == '__main__':
+    robot = RobotController()
+    app = create_app(robot)
     try:
         print("Starting Robot Controller...")
+        # Bind the web server straight away and bring up GPIO and camera alongside it
+        robot.start_hardware(wait=False)
         print("Web interface available at: http://localhost:5000")
-        app.run(host='0.0.0.0', port=5000, debug=False)
+        if SERVER_MODE == 'dev':
+            app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+        else:
+            serve(app, host='0.0.0.0', port=5000,
+                  control_workers=SERVER_CONTROL_WORKERS,
+                  stream_workers=SERVER_STREAM_WORKERS)
     except KeyboardInterrupt:
         print("\nShutting down robot controller...")
-        robot.cleanup()
     except Exception as e:
         print(f"Error: {e}")
-        robot.cleanup() 
\ No newline at end of file
+    finally:
+        robot.cleanup()
@@ -0,0 +1,146 @@
+import select
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler without per-request access logging"""
+
+    # One request per connection, so an idle keep-alive socket never holds a worker
+    protocol_version = 'HTTP/1.0'
+
+    def log_request(self, code='-', size='-'):
+        pass
+
+
+class IsolatedWSGIServer(BaseWSGIServer):
+    """WSGI server that keeps long-lived connections away from control requests.
+
+    Short control requests are served by a bounded thread pool. Video
+    streams and WebSocket sessions each get their own fixed number of
+    slots; when those are full, new long-lived connections are refused
+    with 503 instead of taking workers from the control pool.
+
+    The accept loop never reads from a client. Each connection goes to a
+    dispatcher thread that waits for the request line and only then
+    picks the lane; a client that sends no request line within
+    header_timeout is closed rather than served as a control request.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, control_workers=8, stream_workers=4, socket_workers=2,
+                 dispatch_workers=16, header_timeout=5.0,
+                 stream_prefixes=('/video_feed',), socket_prefixes=('/ws/',)):
+        super().__init__(host, port, app, handler=QuietRequestHandler)
+        self.control_pool = ThreadPoolExecutor(max_workers=control_workers, thread_name_prefix='http-control')
+        self.dispatch_slots = threading.BoundedSemaphore(dispatch_workers)
+        self.header_timeout = header_timeout
+        self.lanes = [
+            ('stream', stream_prefixes, threading.BoundedSemaphore(stream_workers)),
+            ('socket', socket_prefixes, threading.BoundedSemaphore(socket_workers))
+        ]
+
+        # Server statistics
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _request_path(self, request):
+        """Peek at the request line without consuming it; None if it does not arrive in time"""
+        deadline = time.monotonic() + self.header_timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                ready, _, _ = select.select([request], [], [], remaining)
+                if not ready:
+                    return None
+                data = request.recv(1024, socket.MSG_PEEK)
+                if not data:
+                    return None    # closed before sending a request
+                if b'\r\n' in data or len(data) >= 1024:
+                    break
+                # Only part of the line is here; the socket stays readable, so wait a little
+                time.sleep(0.01)
+        except OSError:
+            return None
+        parts = data.split(b'\r\n', 1)[0].split()
+        return parts[1].decode('latin-1') if len(parts) >= 2 else ''
+
+    def process_request(self, request, client_address):
+        # Runs on the accept loop: hand the connection off without reading from it
+        if not self.dispatch_slots.acquire(blocking=False):
+            self._reject(request)
+            return
+        thread = threading.Thread(target=self._dispatch, args=(request, client_address),
+                                  name='http-dispatch', daemon=True)
+        thread.start()
+
+    def _dispatch(self, request, client_address):
+        """Read the request line, then serve the connection in its lane"""
+        try:
+            path = self._request_path(request)
+        finally:
+            self.dispatch_slots.release()
+        if path is None:
+            self.timed_out += 1
+            self.shutdown_request(request)
+            return
+        for name, prefixes, slots in self.lanes:
+            if path.startswith(prefixes):
+                if not slots.acquire(blocking=False):
+                    self._reject(request)
+                    return
+                # Long-lived: keep serving on this thread
+                threading.current_thread().name = f'http-{name}'
+                self._serve(request, client_address, slots)
+                return
+        self.control_pool.submit(self._serve, request, client_address, None)
+
+    def _serve(self, request, client_address, slots):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            if slots is not None:
+                slots.release()
+
+    def _reject(self, request):
+        self.rejected += 1
+        try:
+            request.sendall(b'HTTP/1.0 503 Service Unavailable\r\n'
+                            b'Content-Type: text/plain\r\n'
+                            b'Retry-After: 5\r\n\r\n'
+                            b'Too many clients\n')
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.control_pool.shutdown(wait=False)
+
+
+def serve(app, host='0.0.0.0', port=5000, on_shutdown=None, **server_options):
+    """Run app on an IsolatedWSGIServer until SIGINT or SIGTERM, then shut down cleanly"""
+    server = IsolatedWSGIServer(host, port, app, **server_options)
+
+    def request_shutdown(signum, frame):
+        # shutdown() waits for serve_forever() to return, so it cannot run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGINT, request_shutdown)
+    signal.signal(signal.SIGTERM, request_shutdown)
+    try:
+        server.serve_forever()
+    finally:
+        print("\nShutting down server...")
+        if on_shutdown is not None:
+            on_shutdown()
+        server.server_close()
@@ -0,0 +1,139 @@
+import struct
+import threading
+import time
+
+def jpeg_size(jpeg):
+    """Read (width, height) from a JPEG's frame header without decoding it"""
+    data = bytes(jpeg[:65536])
+    index = 2
+    while index + 9 < len(data):
+        if data[index] != 0xFF:
+            return None
+        marker = data[index + 1]
+        length = struct.unpack('>H', data[index + 2:index + 4])[0]
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', data[index + 5:index + 9])
+            return width, height
+        index += 2 + length
+    return None
+
+
+class SnapshotCache:
+    """Still images from a frame broadcaster, with thumbnails cached per frame.
+
+    The camera pipeline idles while nobody is subscribed, so a snapshot
+    request holds a short subscription lease: the first request wakes the
+    pipeline, and polling clients keep it running until no snapshot has
+    been asked for in linger seconds.
+    """
+
+    def __init__(self, broadcaster, linger=5.0, max_age=0.5, thumbnail_quality=70):
+        self.broadcaster = broadcaster
+        self.linger = linger
+        self.max_age = max_age
+        self.thumbnail_quality = thumbnail_quality
+
+        # Thumbnails of the current frame: width -> JPEG bytes
+        self.thumbnails = {}
+        self.thumbnail_sequence = 0
+        self.thumbnail_lock = threading.Lock()
+
+        # Subscription lease
+        self.lock = threading.Lock()
+        self.subscribed = False
+        self.last_request = 0
+        self.lease_timer = None
+
+        # Snapshot statistics
+        self.requests = 0
+        self.thumbnails_rendered = 0
+
+    def get(self, timeout=2.0):
+        """Get (sequence, publish time, JPEG view) of a fresh frame, or None if there is none"""
+        self.requests += 1
+        self._renew_lease()
+        sequence, jpeg = self.broadcaster.get_frame()
+        published = self.broadcaster.get_frame_time(sequence) if sequence else None
+        if published is None or time.time() - published > self.max_age:
+            # The pipeline was idle; wait for it to publish a new frame
+            sequence, jpeg = self.broadcaster.wait_for_frame(sequence, timeout)
+            published = self.broadcaster.get_frame_time(sequence) if sequence else None
+        if jpeg is None or published is None:
+            return None
+        return sequence, published, jpeg
+
+    def get_thumbnail(self, sequence, jpeg, width):
+        """Get frame sequence scaled down to width, rendering it once per frame"""
+        with self.thumbnail_lock:
+            if self.thumbnail_sequence != sequence:
+                self.thumbnails = {}
+                self.thumbnail_sequence = sequence
+            thumbnail = self.thumbnails.get(width)
+            if thumbnail is None:
+                thumbnail = self.thumbnails[width] = self._render_thumbnail(jpeg, width)
+                self.thumbnails_rendered += 1
+            return thumbnail
+
+    def _render_thumbnail(self, jpeg, width):
+        import cv2
+        import numpy as np
+
+        data = np.frombuffer(jpeg, dtype=np.uint8)
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the thumbnail is small enough
+        size = jpeg_size(jpeg)
+        full_width = size[0] if size else width
+        flag = cv2.IMREAD_COLOR
+        for factor, reduced_flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                     (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if full_width // factor >= width:
+                flag = reduced_flag
+                break
+        frame = cv2.imdecode(data, flag)
+        if frame.shape[1] > width:
+            height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.thumbnail_quality])
+        return buffer.tobytes()
+
+    def _renew_lease(self):
+        with self.lock:
+            self.last_request = time.monotonic()
+            if not self.subscribed:
+                self.broadcaster.subscribe()
+                self.subscribed = True
+                self._schedule_release(self.linger)
+
+    def _schedule_release(self, delay):
+        self.lease_timer = threading.Timer(delay, self._release_lease)
+        self.lease_timer.daemon = True
+        self.lease_timer.start()
+
+    def _release_lease(self):
+        """Drop the subscription once no snapshot was requested for linger seconds"""
+        with self.lock:
+            if not self.subscribed:
+                return
+            remaining = self.last_request + self.linger - time.monotonic()
+            if remaining > 0:
+                self._schedule_release(remaining)
+                return
+            self.subscribed = False
+            self.broadcaster.unsubscribe()
+
+    def get_stats(self):
+        """Get snapshot statistics"""
+        return {
+            'requests': self.requests,
+            'thumbnails_rendered': self.thumbnails_rendered,
+            'active': self.subscribed
+        }
+
+    def close(self):
+        """Cancel the subscription lease"""
+        with self.lock:
+            if self.lease_timer is not None:
+                self.lease_timer.cancel()
+            if self.subscribed:
+                self.subscribed = False
+                self.broadcaster.unsubscribe()
@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+class Telemetry:
+    """Non-blocking structured event log.
+
+    record() only appends a small dict to an in-memory ring buffer; a
+    background writer drains it to a JSONL file. Events can be sampled
+    (keep one in N) and rate limited per kind, and if the writer falls
+    behind the oldest events are overwritten instead of blocking the
+    caller.
+    """
+
+    def __init__(self, path=None, capacity=4096, flush_interval=0.5,
+                 max_file_bytes=10 * 1024 * 1024, limits=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.buffer = deque(maxlen=capacity)
+
+        # Per-kind limits: {'kind': {'sample': N, 'max_rate': events per second}}
+        self.limits = limits or {}
+        self.seen = {}
+        self.windows = {}
+
+        # Telemetry statistics
+        self.recorded = 0
+        self.sampled_out = 0
+        self.rate_limited = 0
+        self.overwritten = 0
+        self.written = 0
+
+        self.is_running = True
+        self.writer_thread = None
+        if path:
+            self.writer_thread = threading.Thread(target=self._writer_loop, name='telemetry', daemon=True)
+            self.writer_thread.start()
+
+    def record(self, kind, **fields):
+        """Record one event; never blocks on I/O"""
+        limit = self.limits.get(kind)
+        if limit is not None:
+            seen = self.seen.get(kind, 0) + 1
+            self.seen[kind] = seen
+            if seen % limit.get('sample', 1):
+                self.sampled_out += 1
+                return
+
+            max_rate = limit.get('max_rate')
+            if max_rate:
+                now = time.monotonic()
+                window_start, count = self.windows.get(kind, (now, 0))
+                if now - window_start >= 1.0:
+                    window_start, count = now, 0
+                if count >= max_rate:
+                    self.rate_limited += 1
+                    return
+                self.windows[kind] = (window_start, count + 1)
+
+        fields['t'] = round(time.time(), 4)
+        fields['e'] = kind
+        if len(self.buffer) == self.buffer.maxlen:
+            self.overwritten += 1
+        self.buffer.append(fields)
+        self.recorded += 1
+
+    def _writer_loop(self):
+        """Drain the ring buffer to disk in batches"""
+        while self.is_running:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write all buffered events to the telemetry file"""
+        if not self.path:
+            return
+        lines = []
+        while True:
+            try:
+                event = self.buffer.popleft()
+            except IndexError:
+                break
+            lines.append(json.dumps(event, separators=(',', ':')))
+        if not lines:
+            return
+
+        try:
+            self._rotate()
+            with open(self.path, 'a') as f:
+                f.write('\n'.join(lines) + '\n')
+            self.written += len(lines)
+        except OSError as e:
+            print(f"Telemetry write error: {e}")
+
+    def _rotate(self):
+        """Keep one previous file once the current one reaches max_file_bytes"""
+        try:
+            if os.path.getsize(self.path) >= self.max_file_bytes:
+                os.replace(self.path, self.path + '.1')
+        except FileNotFoundError:
+            pass
+
+    def get_stats(self):
+        """Get telemetry statistics"""
+        return {
+            'recorded': self.recorded,
+            'buffered': len(self.buffer),
+            'written': self.written,
+            'sampled_out': self.sampled_out,
+            'rate_limited': self.rate_limited,
+            'overwritten': self.overwritten
+        }
+
+    def close(self):
+        """Stop the writer and flush what is left"""
+        self.is_running = False
+        if self.writer_thread is not None:
+            self.writer_thread.join(timeout=2 * self.flush_interval + 1)
+        self.flush()
@@ -0,0 +1,286 @@
+import argparse
+import multiprocessing
+import threading
+import time
+from histogram import Histogram
+
+# Frames are grayscale NumPy arrays; every stage works on whole arrays,
+# never on individual pixels in Python.
+
+def decode_gray(jpeg, reduce=2):
+    """Decode a JPEG straight to grayscale, letting libjpeg scale it down by 1, 2, 4 or 8"""
+    import cv2
+    import numpy as np
+
+    flags = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+             4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+    return cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), flags[reduce])
+
+def find_line(gray, band=0.3, bright=True, min_fraction=0.02):
+    """Find a line in the bottom band of the image.
+
+    Returns (offset, confidence): offset is the line's horizontal position
+    from -1 (left edge) to 1 (right edge), or None if no line was found.
+    """
+    import cv2
+    import numpy as np
+
+    height, width = gray.shape
+    roi = gray[int(height * (1 - band)):]
+    # A uniform floor has no line, and Otsu would only split its noise
+    if int(roi.max()) - int(roi.min()) < 40:
+        return None, 0.0
+    # Otsu picks the threshold between line and floor for each frame
+    mode = cv2.THRESH_BINARY if bright else cv2.THRESH_BINARY_INV
+    _, mask = cv2.threshold(roi, 0, 1, mode | cv2.THRESH_OTSU)
+
+    columns = mask.sum(axis=0, dtype=np.int64)
+    total = columns.sum()
+    fraction = total / mask.size
+    if fraction < min_fraction or fraction > 0.5:
+        return None, float(fraction)
+    centroid = float(np.dot(columns, np.arange(width))) / total
+    return 2.0 * centroid / (width - 1) - 1.0, float(fraction)
+
+def detect_obstacle(gray, zone=(0.3, 0.7, 0.35, 0.7), threshold=0.12):
+    """Flag an obstacle when the area just ahead of the robot is full of edges.
+
+    zone is (left, right, top, bottom) as fractions of the image. Returns
+    (blocked, score), where score is the fraction of edge pixels in the zone.
+    """
+    import numpy as np
+
+    height, width = gray.shape
+    left, right, top, bottom = zone
+    region = gray[int(height * top):int(height * bottom), int(width * left):int(width * right)]
+    region = region.astype(np.int16)
+    # Horizontal and vertical gradients of the whole region at once
+    edges = (np.abs(np.diff(region, axis=1))[:-1] + np.abs(np.diff(region, axis=0))[:, :-1]) > 60
+    score = float(edges.mean()) if edges.size else 0.0
+    return score > threshold, score
+
+
+class LineFollower:
+    """Default vision stage: follow a line and stop for obstacles.
+
+    Any object with a process(gray) method returning a dict with
+    'throttle', 'turn' and 'timings' (stage name -> ms) can replace it.
+    """
+
+    def __init__(self, speed=0.4, gain=0.8, bright_line=True):
+        self.speed = speed
+        self.gain = gain
+        self.bright_line = bright_line
+
+    def process(self, gray):
+        start = time.perf_counter()
+        offset, confidence = find_line(gray, bright=self.bright_line)
+        line_done = time.perf_counter()
+        blocked, obstacle_score = detect_obstacle(gray)
+        obstacle_done = time.perf_counter()
+
+        if blocked or offset is None:
+            throttle, turn = 0.0, 0.0
+        else:
+            turn = max(-1.0, min(1.0, self.gain * offset))
+            # Slow down in curves
+            throttle = self.speed * (1.0 - 0.5 * abs(offset))
+
+        return {
+            'throttle': throttle,
+            'turn': turn,
+            'line_offset': offset,
+            'line_confidence': round(confidence, 3),
+            'obstacle': blocked,
+            'obstacle_score': round(obstacle_score, 3),
+            'timings': {
+                'line': (line_done - start) * 1000,
+                'obstacle': (obstacle_done - line_done) * 1000
+            }
+        }
+
+
+def process_jpeg(stage, jpeg, reduce=2):
+    """Decode one JPEG frame and run stage on it, adding decode and total times"""
+    start = time.perf_counter()
+    gray = decode_gray(jpeg, reduce)
+    decoded = time.perf_counter()
+    result = stage.process(gray)
+    result['timings']['decode'] = (decoded - start) * 1000
+    result['timings']['total'] = (time.perf_counter() - start) * 1000
+    return result
+
+def _worker_main(conn, stage_factory, reduce):
+    """Vision process: receive JPEG frames, reply with setpoints"""
+    # Load OpenCV before the first frame arrives
+    import cv2
+    stage = stage_factory()
+    while True:
+        jpeg = conn.recv_bytes()
+        if not jpeg:
+            break
+        conn.send(process_jpeg(stage, jpeg, reduce))
+    conn.close()
+
+
+class VisionWorker:
+    """Run a vision stage in a separate process on frames from a broadcaster.
+
+    A feeder thread sends the newest frame to the worker process and waits
+    for its answer before sending the next, so frames that arrive while
+    the worker is busy are skipped rather than queued. Each result's
+    throttle and turn go to on_setpoint(throttle, turn).
+    """
+
+    def __init__(self, broadcaster, on_setpoint, stage_factory=LineFollower, reduce=2, timeout=1.0):
+        self.broadcaster = broadcaster
+        self.on_setpoint = on_setpoint
+        self.stage_factory = stage_factory
+        self.reduce = reduce
+        self.timeout = timeout
+
+        # Vision statistics (stage timings in milliseconds)
+        self.stage_times = {}
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.timeouts = 0
+        self.last_result = None
+
+        self.process = None
+        self.conn = None
+        self.thread = None
+        self.is_running = False
+
+    def start(self):
+        """Start the worker process and the feeder thread"""
+        # Spawn rather than fork: the parent has camera, GPIO and server threads running
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, name='vision',
+                                       args=(child_conn, self.stage_factory, self.reduce), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.is_running = True
+        self.broadcaster.subscribe()
+        self.thread = threading.Thread(target=self._feed_loop, name='vision-feed', daemon=True)
+        self.thread.start()
+
+    def _feed_loop(self):
+        last_sequence, _ = self.broadcaster.get_frame()
+        try:
+            while self.is_running and self.broadcaster.is_running:
+                sequence, jpeg = self.broadcaster.wait_for_frame(last_sequence, timeout=0.5)
+                if sequence == last_sequence or jpeg is None:
+                    continue
+                if last_sequence:
+                    self.frames_skipped += sequence - last_sequence - 1
+                last_sequence = sequence
+
+                sent = time.monotonic()
+                self.conn.send_bytes(jpeg)
+                while self.is_running and not self.conn.poll(0.5):
+                    pass
+                if not self.is_running:
+                    break
+                result = self.conn.recv()
+                if time.monotonic() - sent > self.timeout:
+                    # Too old to steer with; the motor watchdog covers the gap
+                    self.timeouts += 1
+                    continue
+                self.frames_processed += 1
+                self.last_result = result
+                for stage, ms in result['timings'].items():
+                    histogram = self.stage_times.get(stage)
+                    if histogram is None:
+                        histogram = self.stage_times[stage] = Histogram()
+                    histogram.observe(ms)
+                if self.is_running:
+                    self.on_setpoint(result['throttle'], result['turn'])
+        except (EOFError, OSError) as e:
+            if self.is_running:
+                print(f"Vision worker error: {e}")
+                self.is_running = False
+
+    def get_stats(self):
+        """Get frame counts, the last result and per-stage timings in milliseconds"""
+        last = dict(self.last_result) if self.last_result else None
+        if last is not None:
+            last.pop('timings', None)
+        return {
+            'running': self.is_running,
+            'frames_processed': self.frames_processed,
+            'frames_skipped': self.frames_skipped,
+            'timeouts': self.timeouts,
+            'last_result': last,
+            'stage_ms': {stage: {key: value for key, value in histogram.summary().items() if key != 'buckets'}
+                         for stage, histogram in list(self.stage_times.items())}
+        }
+
+    def stop(self):
+        """Stop feeding frames and shut the worker process down"""
+        if self.thread is None:
+            return
+        was_running = self.is_running
+        self.is_running = False
+        self.thread.join(timeout=self.timeout + 1)
+        self.thread = None
+        if was_running or self.process.is_alive():
+            try:
+                self.conn.send_bytes(b'')
+            except OSError:
+                pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+        self.broadcaster.unsubscribe()
+
+
+def iter_mjpeg(path):
+    """Yield the JPEG frames of an MJPEG file, such as a recorder segment"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    position = 0
+    while True:
+        start = data.find(b'\xff\xd8', position)
+        if start < 0:
+            return
+        end = data.find(b'\xff\xd9', start)
+        if end < 0:
+            return
+        position = end + 2
+        yield memoryview(data)[start:position]
+
+def benchmark(paths, stage=None, reduce=2):
+    """Run a vision stage over recorded frames in this process; returns per-stage Histograms"""
+    import cv2  # loaded up front so the first frame's decode time is not the import
+
+    stage = stage or LineFollower()
+    stage_times = {}
+    for path in paths:
+        for jpeg in iter_mjpeg(path):
+            result = process_jpeg(stage, jpeg, reduce)
+            for name, ms in result['timings'].items():
+                stage_times.setdefault(name, Histogram()).observe(ms)
+    return stage_times
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vision stage on recorded MJPEG segments")
+    parser.add_argument('paths', nargs='+', help="MJPEG files, e.g. recordings/segment-*.mjpeg")
+    parser.add_argument('--reduce', type=int, default=2, choices=[1, 2, 4, 8],
+                        help="decode at 1/N scale (the robot decodes the 320x240 low profile at 1/2)")
+    parser.add_argument('--dark-line', action='store_true', help="follow a dark line on a light floor")
+    args = parser.parse_args()
+
+    stage_times = benchmark(args.paths, LineFollower(bright_line=not args.dark_line), args.reduce)
+    total = stage_times.get('total')
+    if total is None:
+        print("No frames found")
+        return
+    print(f"Frames: {total.summary()['count']} ({1000 / total.summary()['mean']:.0f} FPS max)")
+    for name, histogram in stage_times.items():
+        summary = histogram.summary()
+        print(f"{name:>10}: mean {summary['mean']:.2f} ms, p50 {summary['p50']:.2f} ms, p99 {summary['p99']:.2f} ms")
+
+if __name__ == "__main__":
+    main()